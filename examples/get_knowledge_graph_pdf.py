@@ -4,7 +4,8 @@
 # File Name: examples/get_knowledge_graph_pdf.py
 # Description: 为pdf文档抽取知识点图谱
 
-from course_graph.parser import PDFParser
+from course_graph.parser import PDFParser, PageCache
+from course_graph.parser.pdf_parser import RemoteStructureModel, RemoteOCRModel
 from course_graph.database import Neo4j
 from course_graph.llm import Qwen
 from course_graph import set_logger
@@ -17,13 +18,19 @@ parser.add_argument('-u', '--url', default='bolt://localhost:7687')
 parser.add_argument('-n', '--user', default='neo4j')
 parser.add_argument('-p', '--password', default='neo4j')
 parser.add_argument('-f', '--file')
+parser.add_argument('-c', '--cache-dir', default='.cache/page_cache')
+parser.add_argument('-s', '--server', help='常驻模型服务地址, 例如 http://127.0.0.1:8010 (见 parser_server.py)')
 
 args = parser.parse_args()
 assert args.file is not None and args.file.endswith('.pdf'), 'Please input a pdf file.'
 
 model = Qwen()
+models = {
+    'structure_model': RemoteStructureModel(args.server),
+    'ocr_model': RemoteOCRModel(args.server)
+} if args.server else {}
 
-with Neo4j(args.url, args.user, args.password) as neo4j, PDFParser(args.file) as parser:
+with Neo4j(args.url, args.user, args.password) as neo4j, PDFParser(args.file, page_cache=PageCache(args.cache_dir), **models) as parser:
     document = parser.get_document()
     document.set_knowledgepoints_by_llm(model)
     document.to_graph(neo4j)
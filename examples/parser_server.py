@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# Create Date: 2026/10/17
+# Author: wangtao <wangtao.cpu@gmail.com>
+# File Name: examples/parser_server.py
+# Description: 常驻的布局分析和 OCR 模型服务
+
+from course_graph.parser.pdf_parser import ModelServer
+import argparse
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--host', default='127.0.0.1')
+parser.add_argument('--port', type=int, default=8010)
+args = parser.parse_args()
+
+server = ModelServer(host=args.host, port=args.port)
+server.run()
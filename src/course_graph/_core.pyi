@@ -1,3 +1,6 @@
+from numpy import ndarray
+
+
 def get_list(text: str) -> list:
     """ 括号匹配提取列表
 
@@ -23,6 +26,38 @@ def structure(
     """
     pass
 
+def suppress(
+        boxes: ndarray,
+        scores: ndarray,
+        iou_threshold: float = 0.1) -> list[int]:
+    """ 去除重叠的检测框: 被包含的检测框被移除, 其余检测框按置信度从高到低保留, 与已保留的检测框 iou 超过阈值的被移除
+
+    Args:
+        boxes (ndarray): (N, 4) 的 float32 连续数组, (x1, y1, x2, y2) 格式
+        scores (ndarray): (N,) 的 float32 连续数组, 置信度
+        iou_threshold (float, optional): iou 阈值. Defaults to 0.1.
+
+    Returns:
+        list[int]: 保留的检测框下标 (升序, 即保持输入的阅读顺序)
+    """
+    pass
+
+def suppress_batch(
+        boxes: list[ndarray],
+        scores: list[ndarray],
+        iou_threshold: float = 0.1) -> list[list[int]]:
+    """ 批量去除多个页面中重叠的检测框, 计算过程中释放 GIL
+
+    Args:
+        boxes (list[ndarray]): 各页面 (N, 4) 的 float32 连续数组
+        scores (list[ndarray]): 各页面 (N,) 的 float32 连续数组
+        iou_threshold (float, optional): iou 阈值. Defaults to 0.1.
+
+    Returns:
+        list[list[int]]: 各页面保留的检测框下标
+    """
+    pass
+
 def get_longest_seq(
         nums: list[int]) -> tuple[int, int]:
     """ 找到一个最长的连续序列的起点和终点
@@ -58,3 +93,25 @@ def merge(strings: list[str], n: int) -> list[str]:
         list[str]: 合并后的字符串数组
     """
     pass
+
+def heading_level(title: str) -> int:
+    """ 根据标题编号判断层级, 例如 第3章 为1级, 第1节 和 3.1 为2级, 3.1.2 为3级
+
+    Args:
+        title (str): 标题
+
+    Returns:
+        int: 层级, 没有可识别的编号时返回 0
+    """
+    pass
+
+def parse_toc(text: str) -> list[tuple[str, int, int, float]]:
+    """ 解析目录页文字, 识别点状引导线和页码, 合并折行的标题和单独成行的页码
+
+    Args:
+        text (str): 目录页文字
+
+    Returns:
+        list[tuple[str, int, int, float]]: 标题, 页码 (没有页码时为 -1), 层级 (无法确定时为 0) 和置信度
+    """
+    pass
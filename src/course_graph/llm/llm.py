@@ -21,6 +21,7 @@ from .config import LLMConfig, VLLMConfig
 import shlex
 from contextlib import contextmanager
 import re
+from numpy import ndarray
 
 
 class LLMBase:
@@ -52,7 +53,32 @@ class LLMBase:
         self.config: LLMConfig = {}
         
         self._instruction = 'You are a helpful assistant.'
-        
+
+    def __getstate__(self):
+        """ 自定义序列化方法, OpenAI 客户端不可序列化, 只保存其连接参数
+        """
+        state = self.__dict__.copy()
+        state['client'] = (str(self.client.base_url), self.client.api_key)
+        return state
+
+    def __setstate__(self, state):
+        base_url, api_key = state.pop('client')
+        self.__dict__.update(state)
+        with self._proxy_context():
+            self.client = OpenAI(
+                base_url=base_url,
+                api_key=api_key,
+            )
+
+    def __copy__(self):
+        """ 浅拷贝时共享 OpenAI 客户端 (线程安全), 只复制配置和 instruction 等属性
+        """
+        obj = type(self).__new__(type(self))
+        obj.__dict__.update(self.__dict__)
+        obj.extra_body = dict(self.extra_body)
+        obj.config = dict(self.config)
+        return obj
+
     @property
     def instruction(self) -> str:
         return self._instruction
@@ -216,26 +242,50 @@ class LLM(LLMBase):
                 if content:
                     yield content
     
-    def image_chat(self, path: str | list[str], message: str) -> tuple[str, str] | tuple[str, None]:
+    @staticmethod
+    def _get_image_url(image: str | bytes | ndarray) -> str:
+        """ 将图片转换为 image_url, 本地文件和内存中的图片使用 base64 编码
+
+        Args:
+            image (str | bytes | ndarray): 图片路径或 url、编码后的图片数据、opencv (BGR) 图像对象
+
+        Returns:
+            str: image_url
+        """
+        match image:
+            case ndarray():
+                import cv2  # 只在传入图像对象时需要
+                ok, buffer = cv2.imencode('.png', image)
+                if not ok:
+                    raise ValueError('图像编码失败')
+                return f"data:image/png;base64,{base64.b64encode(buffer.tobytes()).decode('utf-8')}"
+            case bytes():
+                suffix = 'jpeg' if image.startswith(b'\xff\xd8') else 'png'
+                return f"data:image/{suffix};base64,{base64.b64encode(image).decode('utf-8')}"
+            case _ if os.path.exists(image):
+                return f"data:image/{Path(image).suffix[1:]};base64,{base64.b64encode(open(image, 'rb').read()).decode('utf-8')}"
+            case _:
+                return image
+
+    def image_chat(self,
+                   path: str | bytes | ndarray | list[str | bytes | ndarray],
+                   message: str) -> tuple[str, str] | tuple[str, None]:
         """ 基于图片单轮对话
 
         Args:
-            url (str): 图片路径
+            path (str | bytes | ndarray | list[str | bytes | ndarray]): 图片路径或 url、编码后的图片数据、opencv (BGR) 图像对象
             message (str): 用户输入
 
         Returns:
             tuple[str, str] | tuple[str, None]: 模型输出, 推理过程
         """
-        if isinstance(path, str):
+        if not isinstance(path, list):
             path = [path]
         content = [
             {
                 'type': 'image_url',
                 'image_url': {
-                    'url': (
-                        f"data:image/{Path(p).suffix[1:]};base64,{base64.b64encode(open(p, 'rb').read()).decode('utf-8')}"
-                        if os.path.exists(p) else p
-                    )
+                    'url': self._get_image_url(p)
                 }
             }
             for p in path
@@ -4,6 +4,8 @@
 # File Name: course_graph/llm/prompt/parser_prompt.py
 # Description: 使用大模型解析文档相关提示词
 
+import json
+
 class ParserPrompt:
 
     @staticmethod
@@ -23,6 +25,23 @@ class ParserPrompt:
     重要提示：仅回复更正后的文本。保留所有原始格式，包括换行符。不要包含任何介绍、解释或元数据。
     OCR结果为: {text}""", '你擅长帮助用户纠正从图片中提取的OCR文字错误。'
 
+    @staticmethod
+    def get_ocr_aided_batch_prompt(texts: dict[str, str]) -> tuple[str, str]:
+        """ 使用大模型批量纠正同一批页面中多个区块的OCR识别错误, 获取相应提示词
+
+        Args:
+            texts (dict[str, str]): 区块编号和原始识别结果
+
+        Returns:
+            str: prompt输出
+        """
+        return f"""你的任务是输出经过纠正后的准确文字。输入是一个JSON对象，键为区块编号，值为该区块的OCR识别结果，各区块按阅读顺序排列。遵循以下准则:
+    1.纠正OCR导致的错别字和错误: 使用上下文和常识来纠正常见的错误，只修复明显的错误，不要不必要地更改内容；
+    2.保持原有结构：不要添加额外的句号或任何不必要的标点符号，不要合并或拆分区块；
+    3.保留原始内容：删除句子或段落中不必要的换行符，确保内容与之前的上下文顺畅连接。
+    重要提示：仅回复一个JSON对象，键为全部原有的区块编号，值为该区块更正后的文本。不要包含任何介绍、解释或元数据。
+    OCR结果为: {json.dumps(texts, ensure_ascii=False)}""", '你擅长帮助用户纠正从图片中提取的OCR文字错误。'
+
     @staticmethod
     def get_directory_prompt(content: str) -> tuple[str, str]:
         """ 使用大模型纠正整理目录, 获取相应提示词
@@ -66,10 +85,10 @@ class ParserPrompt:
         ['3.1.4 确定数据构成'],
         ['3.2 总体和抽样'],
         ['3.2.1 总体和个体'],
-        [3.2.2 样本],
+        ['3.2.2 样本'],
         ['第4章 Python基础'],
-        ['4.1 Python的下载与安装']
-        ['4.2 常用工具包的下载与安装]
+        ['4.1 Python的下载与安装'],
+        ['4.2 常用工具包的下载与安装'],
         ['思考题']
     ]
     输出:
@@ -84,13 +103,13 @@ class ParserPrompt:
         ['3.2.1 总体和个体', '3级标题'],
         ['3.2.2 样本', '3级标题'],
         ['第4章 Python基础', '1级标题'],
-        ['4.1 Python的下载与安装', '2级标题']
-        ['4.2 常用工具包的下载与安装, '2级标题']
+        ['4.1 Python的下载与安装', '2级标题'],
+        ['4.2 常用工具包的下载与安装', '2级标题'],
         ['思考题', '2级标题']
     ]
     输入:"""
         prompt = prompt + '\n[\n'
         for line in directory_list:
-            prompt += f" {line},\n"
+            prompt += f" {[line]},\n"
         prompt += ']\n输出:\n'
         return prompt, 'You are a helpful assistant.'
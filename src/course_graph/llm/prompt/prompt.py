@@ -46,6 +46,11 @@ class Prompt(ABC):
         """
         raise NotImplementedError
 
+    def get_joint_prompt(self, content: str) -> tuple[str, str]:
+        """ 获取联合抽取实体、属性和关系的提示词, 一次请求完成三项抽取
+        """
+        raise NotImplementedError
+
 
 class ExamplePrompt(Prompt):
 
@@ -122,3 +127,32 @@ class ExamplePrompt(Prompt):
         }
         resp = json.dumps(prompt, indent=4, ensure_ascii=False) if self.type == 'json' else json2md(prompt)
         return resp, "你是专门进行属性判别的专家"
+
+    def get_joint_prompt(self,
+                         content: str) -> tuple[str, str]:
+        examples = {}
+        if self.strategy is not None:
+            # 联合抽取前中心实体未知, 属性和关系示例按空实体列表检索
+            examples = {
+                "实体抽取": self.strategy.get_ner_example(content),
+                "属性抽取": self.strategy.get_ae_example(content, []),
+                "关系抽取": self.strategy.get_re_example(content, [])
+            }
+        prompt = {
+            "任务":
+                "请对输入的内容进行总结, 根据总结依次完成三项抽取: "
+                "1. 抽取出符合schema类型的实体; "
+                "2. 对抽取到的实体各自抽取属性值, 属性范围只能来源于提供的attributes, 属性值无需完全重复原文, 可以是你根据原文进行的总结, 如果实体没有能够总结的属性值则不返回; "
+                "3. 以抽取到的实体为中心实体, 寻找与之相关联的知识点并判断二者之间的关系, 如果存在关系但不在所指定的关系范围relations中, 则不返回, 头尾实体不应该相同。"
+                "最后请给出你的总结和抽取结果, 返回的格式为\n```json\n"
+                "{\"entities\": {\"entity_type1\": [\"entity1\", \"entity2\"]}, "
+                "\"attributes\": {\"entity1\": {\"attribute1\": \"value\"}}, "
+                "\"relations\": [{\"head\": \"\", \"relation\": \"\", \"tail\": \"\"}]}\n```",
+            "schema": ONTOLOGY['entities'],
+            "attributes": ONTOLOGY['attributes'],
+            "relations": ONTOLOGY['relations'],
+            "示例": examples,
+            "输入": content
+        }
+        resp = json.dumps(prompt, indent=4, ensure_ascii=False) if self.type == 'json' else json2md(prompt)
+        return resp, "你是专门进行实体、属性和关系抽取的专家"
@@ -6,7 +6,6 @@
 
 from tqdm import tqdm
 import numpy as np
-from pymilvus import MilvusClient
 from ..llm import LLM
 from abc import ABC, abstractmethod
 from typing import Optional, TYPE_CHECKING
@@ -75,6 +74,7 @@ class SentenceEmbeddingStrategy(PromptStrategy):
             avoid_first (bool, optional): 去掉相似度最大的那个示例且不减少最终 topk 数量. Default to False.
         """
         super().__init__()
+        from pymilvus import MilvusClient  # 延迟导入, 只有使用该策略时才加载向量数据库依赖
         self.client = MilvusClient(milvus_path)
         self.embed_model = embed_model
         self.collection = 'prompt_example'
@@ -4,7 +4,7 @@
 # File Name: course_graph/parser/__init__.py
 # Description: 文档解析器接口
 
-from .pdf_parser import PDFParser
+from .pdf_parser import PDFParser, PageCache
 from .docx_parser import DOCXParser
 from .document import Document
 from .types import BookMark
@@ -12,3 +12,4 @@ from .parser import Parser
 from .types import Page
 from .config import CONFIG
 from .utils import instance_method_transactional
+from .journal import ExtractionJournal
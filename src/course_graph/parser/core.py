@@ -8,9 +8,73 @@ from ..llm.prompt import ExamplePrompt, Prompt, post_process
 from ..llm import LLM
 import random
 from collections import Counter
+from typing import Callable
 from loguru import logger
 
 
+def _sample_by_llm(
+        message: str,
+        llm: LLM,
+        parse: Callable[[str], tuple],
+        self_consistency: bool,
+        samples: int,
+        top: float
+) -> tuple[dict, list[tuple]]:
+    """ 按默认策略或自我一致性策略调用大模型抽取实体
+
+    Args:
+        message (str): 提示词
+        llm (LLM): 大模型
+        parse (Callable[[str], tuple]): 解析模型回复的函数, 返回值的第一项为实体 {'entity_type': ['entity1']}
+        self_consistency (bool): 是否使用自一致性策略
+        samples (int): 采样次数
+        top (float): 置信度阈值
+
+    Returns:
+        tuple[dict, list[tuple]]: 最终采纳的实体, 以及各次采样的解析结果 (默认策略下只有最后一次)
+    """
+    if not self_consistency:
+        # 默认策略：实体生成数量过多则重试，否则随机选择5个
+        retry = 0
+        while True:
+            resp, _ = llm.chat(message)
+            result = parse(resp)
+            entities: dict = result[0]
+            if all(len(value) < 8 for value in entities.values()) or retry >= 3:
+                break
+            retry += 1
+        for entity_type, entity_list in entities.items():
+            if len(entity_list) > 10:
+                entities[entity_type] = random.sample(entity_list, 5)
+        return entities, [result]
+
+    # 自我一致性验证
+    results: list[tuple] = []
+    for idx in range(samples):
+        resp, _ = llm.chat(message)
+        logger.info(f'第{idx}次采样: ' + resp)
+        result = parse(resp)
+        logger.info(f'获取知识点实体: ' + str(result[0]))
+        results.append(result)
+
+    entities = {}
+    # 这里的自我一致性是要求每种类型中提及的实体超过一定数量
+    for entity_type in {k for result in results for k in result[0]}:  # 所有的 keys
+        elements = [item for result in results if entity_type in result[0] for item in result[0][entity_type]]
+        entities[entity_type] = [point for point, count in Counter(elements).items() if count > (samples * top)]
+    return entities, results
+
+
+def _vote_relations(all_relations: list[dict], samples: int, top: float) -> list[dict]:
+    """ 自我一致性策略下保留出现次数超过 samples * top 的关系三元组
+    """
+    return [
+        dict(relation)
+        for relation, count in Counter(frozenset(relation.items()) for relation in all_relations).items() if
+        count > (samples * top)
+    ]
+
+
 def get_knowledgepoint_entities_by_llm(
         content: str,
         llm: LLM,
@@ -34,35 +98,8 @@ def get_knowledgepoint_entities_by_llm(
     """
     message, instruction = prompt.get_ner_prompt(content)
     llm.instruction = instruction
-    if not self_consistency:
-        # 默认策略：实体生成数量过多则重试，否则随机选择5个
-        retry = 0
-        while True:
-            resp, _ = llm.chat(message)
-            entities: dict = post_process(resp) or {}
-            if all(len(value) < 8 for value in entities.values()) or retry >= 3:
-                break
-            retry += 1
-        for entity_type, entity_list in entities.items():
-            if len(entity_list) > 10:
-                entities[entity_type] = random.sample(entity_list, 5)
-    else:
-        # 自我一致性验证
-        all_entities: list[dict] = []
-        for idx in range(samples):
-            resp, _ = llm.chat(message)
-            logger.info(f'第{idx}次采样: ' + resp)
-            entities: dict = post_process(resp) or {}
-
-            logger.info(f'获取知识点实体: ' + str(entities))
-            all_entities.append(entities)
-
-        entities = {}
-        # 这里的自我一致性是要求每种类型中提及的实体超过一定数量
-        for entity_type in {k for d in all_entities for k in d}:  # 所有的 keys
-            elements = [item for d in all_entities if entity_type in d for item in d[entity_type]]
-            entities[entity_type] = [point for point, count in Counter(elements).items() if count > (samples * top)]
-    # 分支结束得到 entities {'entity_type': ['entity1', 'entity2']}
+    entities, _ = _sample_by_llm(message, llm, lambda resp: (post_process(resp) or {},), self_consistency, samples, top)
+    # 得到 entities {'entity_type': ['entity1', 'entity2']}
     return entities
 
 
@@ -123,15 +160,60 @@ def get_knowledgepoint_relations_by_llm(
             logger.info(f'第{idx}次采样: ' + resp)
             relations = post_process(resp) or []
             all_relations.extend(relations)
-        relations = [
-            dict(relation)
-            for relation, count in Counter(frozenset(relation.items()) for relation in all_relations).items() if
-            count > (samples * top)
-        ]
+        relations = _vote_relations(all_relations, samples, top)
     # 分支结束得到 relations [{'head':'', 'relation':'', 'tail':''}]
     return relations
 
 
+def get_knowledgepoint_joint_by_llm(
+        content: str,
+        llm: LLM,
+        prompt: Prompt = ExamplePrompt(),
+        self_consistency: bool = False,
+        samples: int = 5,
+        top: float = 0.5
+) -> tuple[dict, dict, list]:
+    """ 使用大模型在一次请求中联合抽取知识点实体、属性和关系
+
+    Args:
+        content (str): 文本内容
+        llm (LLM): 大模型
+        prompt (Prompt, optional): 提示词生成器. Defaults to ExamplePrompt().
+        self_consistency (bool, optional): 是否使用自一致性策略. Defaults to False.
+        samples (int, optional): 采样次数. Defaults to 5.
+        top (float, optional): 置信度阈值. Defaults to 0.5.
+
+    Returns:
+        tuple[dict, dict, list]: 知识点列表、属性和关系三元组列表, 格式与分别抽取时相同
+    """
+    message, instruction = prompt.get_joint_prompt(content)
+    llm.instruction = instruction
+
+    def parse(resp: str) -> tuple[dict, dict, list]:
+        result = post_process(resp)
+        if not isinstance(result, dict):
+            return {}, {}, []
+        return result.get('entities') or {}, result.get('attributes') or {}, result.get('relations') or []
+
+    entities, all_results = _sample_by_llm(message, llm, parse, self_consistency, samples, top)
+    if not self_consistency:
+        _, attrs, relations = all_results[0]
+    else:
+        # 属性不参与投票, 保留最先出现的值
+        attrs = {}
+        for _, attrs_, _ in all_results:
+            for name, attr in attrs_.items():
+                if isinstance(attr, dict):
+                    for attr_name, value in attr.items():
+                        attrs.setdefault(name, {}).setdefault(attr_name, value)
+        relations = _vote_relations([relation for _, _, relations_ in all_results for relation in relations_], samples, top)
+
+    # 只保留被采纳实体的属性
+    names = {entity_name for entity_list in entities.values() for entity_name in entity_list}
+    attrs = {name: attr for name, attr in attrs.items() if name in names}
+    return entities, attrs, relations
+
+
 def get_knowledgepoint_attribute_only_by_llm(
         knowledgepoint: str,
         attribute: str,
@@ -11,10 +11,15 @@ import pickle
 import os
 from .config import CONFIG
 from .utils import instance_method_transactional
+from .journal import ExtractionJournal
 from ..resource import ResourceMap
-from .types import BookMark, KPEntity, KPRelation, ContentType
+from .types import BookMark, KPEntity, ContentType, KnowledgePointStore
 from tqdm import tqdm
 from course_graph._core import merge
+from typing import Generator
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+import copy
 from ..database import Neo4j
 from .core import *
 
@@ -35,7 +40,7 @@ class Document:
         self.file_path = parser.file_path
         self.bookmarks = parser.get_bookmarks()
 
-        self.knowledgepoints: list[KPEntity] = []  # 全局共享状态
+        self.knowledgepoints = KnowledgePointStore()  # 全局共享状态
         self.checkpoint = {
             'extract_index': 0
         }
@@ -68,6 +73,8 @@ class Document:
         with open(path, 'rb') as f:
             document: Document = pickle.load(f)
             document.parser = parser
+            if not isinstance(document.knowledgepoints, KnowledgePointStore):  # 兼容旧版本保存的列表
+                document.knowledgepoints = KnowledgePointStore(document.knowledgepoints)
             return document
 
     def flatten_bookmarks(self) -> list[BookMark]:
@@ -105,7 +112,10 @@ class Document:
             samples: int = 5,
             top: float = 0.5,
             text_length: int = 400,
-            checkpoint: bool = False) -> None:
+            checkpoint: bool = False,
+            concurrency: int = 1,
+            journal: str = None,
+            joint: bool = False) -> None:
         """ 使用 LLM 抽取知识点存储到 BookMark 中
 
         Args:
@@ -116,83 +126,122 @@ class Document:
             top (float, optional): 采用自我一致性策略时，出现次数超过 top * samples 时才会被采纳，范围为 [0, 1]. Defaults to 0.5.
             text_length (int, optional): 合并文本的长度. Defaults to 400.
             checkpoint (bool, optional): 如果保存有断点信息, 是否继续从断点处运行. Defaults to False.
+            concurrency (int, optional): 同时进行抽取的文本片段数量. 各片段的大模型调用并发进行, 抽取结果仍按文档顺序依次合并, 结果与串行抽取一致. Defaults to 1.
+            journal (str, optional): 抽取结果日志路径, 每个片段抽取完成后立即追加记录, 再次运行时回放已记录的片段并从未完成的片段继续. Defaults to None.
+            joint (bool, optional): 是否在一次请求中联合抽取实体、属性和关系, 提示词类未实现 get_joint_prompt 时退回分别抽取. Defaults to False.
         """
+        if joint and type(prompt).get_joint_prompt is Prompt.get_joint_prompt:
+            logger.warning(f'{type(prompt).__name__} 未实现 get_joint_prompt, 退回分别抽取实体、属性和关系')
+            joint = False
+
+        def extract(content: str) -> tuple[dict, dict, list]:
+            # 只调用大模型, 不读写共享状态, 可以在多个线程中同时进行
+            llm_ = copy.copy(llm)  # 每个线程使用独立的 instruction
+            if joint:
+                entities, attrs, relations = get_knowledgepoint_joint_by_llm(content, llm_, prompt, self_consistency, samples, top)
+                logger.success(f'联合抽取获取知识点实体: {entities}, 属性: {attrs}, 关系三元组: {relations}')
+                return entities, attrs, relations
 
-        @instance_method_transactional('knowledgepoints')
-        def get_knowledgepoints_by_llm(
-                self: 'Document',  # 这里需要传递self的原因是instance_method_transactional本来只能装饰实例方法
-                content: str) -> list[KPEntity]:
             # 实体抽取
-            entities = get_knowledgepoint_entities_by_llm(content, llm, prompt, self_consistency, samples, top)
+            entities = get_knowledgepoint_entities_by_llm(content, llm_, prompt, self_consistency, samples, top)
             logger.success(f'最终获取知识点实体: ' + str(entities))
+            names = [entity_name for entity_list in entities.values() for entity_name in entity_list]
+
+            # 属性抽取
+            attrs = {}
+            if len(names) != 0:
+                attrs = get_knowledgepoint_attributes_by_llm(content, names, llm_, prompt)  # 只使用 name
+                logger.success(f'获取知识点属性: ' + str(attrs))
 
-            center_kps: list[KPEntity] = []  # only for center entity
+            relations = get_knowledgepoint_relations_by_llm(content, names, llm_, prompt, self_consistency, samples, top)
+            logger.success(f'最终获取关系三元组: ' + str(relations))
+            return entities, attrs, relations
+
+        def extract_and_record(key: str, content: str, total: int) -> tuple[dict, dict, list]:
+            result = extract(content)
+            journal_.append(key, content, total, result)
+            return result
+
+        def submit(index: int, bookmark: BookMark, position: int, chunks: list[str | None]) -> Future:
+            # chunks 中的 None 表示该片段没有解析, 直接回放日志中的结果
+            content = chunks[position]
+            if journal_ is None:
+                return executor.submit(extract, content)
+            key = journal_.get_key(index, bookmark, position)
+            if (result := journal_.get(key, content)) is None:
+                return executor.submit(extract_and_record, key, content, len(chunks))
+            future = Future()  # 回放日志中的结果, 仍按文档顺序合并
+            future.set_result(result)
+            return future
+
+        @instance_method_transactional('knowledgepoints')
+        def merge_knowledgepoints(
+                self: 'Document',  # 这里需要传递self的原因是instance_method_transactional本来只能装饰实例方法
+                entities: dict,
+                attrs: dict,
+                relations: list) -> list[KPEntity]:
+            center_kps: dict[str, KPEntity] = {}  # only for center entity
             for entity_type, entity_list in entities.items():
                 for entity_name in entity_list:  # entity_type 不再作为单独出现而是作为属性
+                    if entity_name in center_kps:
+                        continue
                     # 复用知识点实体
-                    if kp := next((kp for kp in self.knowledgepoints if kp.name == entity_name), None):
-                        kp.marginalized = False
-                        center_kps.append(kp)
+                    if kp := self.knowledgepoints.get(entity_name):
+                        if kp.marginalized:
+                            self.knowledgepoints.update(kp, marginalized=False)
                     else:
                         kp = KPEntity(id='2:' + str(shortuuid.uuid()), name=entity_name, type=entity_type)
                         self.knowledgepoints.append(kp)
-                        center_kps.append(kp)
-
-            # 属性抽取
-            if len(center_kps) == 0:
-                pass
-            else:
-                attrs = get_knowledgepoint_attributes_by_llm(content, [kp.name for kp in center_kps], llm, prompt)  # 只使用 name
-                logger.success(f'获取知识点属性: ' + str(attrs))
-
-                for name, attr in attrs.items():
-                    # 使用 name 匹配
-                    if matching_kp := next((kp for kp in center_kps if kp.name == name), None):
-                        # 更新相应的属性值
-                        if isinstance(attr, dict):
-                            for attr_name, value in attr.items():
-                                matching_kp.cached_attributes.setdefault(attr_name, []).append(value)
-
-            relations = get_knowledgepoint_relations_by_llm(content, [kp.name for kp in center_kps], llm, prompt, self_consistency, samples, top)
-            logger.success(f'最终获取关系三元组: ' + str(relations))
+                    center_kps[entity_name] = kp
+
+            for name, attr in attrs.items():
+                # 使用 name 匹配
+                if matching_kp := center_kps.get(name):
+                    # 更新相应的属性值
+                    if isinstance(attr, dict):
+                        for attr_name, value in attr.items():
+                            self.knowledgepoints.add_cached_attribute(matching_kp, attr_name, value)
+
+            def get_or_create(name: str) -> KPEntity:
+                # 优先使用中心实体, 其次复用已有实体, 否则创建边缘化的实体
+                if kp := center_kps.get(name) or self.knowledgepoints.get(name):
+                    return kp
+                kp = KPEntity(id='2:' + str(shortuuid.uuid()), name=name, type='', marginalized=True)
+                self.knowledgepoints.append(kp)
+                return kp
 
             for rela in relations:
-                head, tail = None, None
-                if head_name := rela.get('head'):
-                    kp = next((kp for kp in center_kps if kp.name == head_name), None)
-                    if not kp:
-                        kp = KPEntity(id='2:' + str(shortuuid.uuid()), name=head_name, type='', marginalized=True)
-                        self.knowledgepoints.append(kp)
-                        head = kp
-                if tail_name := rela.get('tail'):
-                    kp = next((kp for kp in center_kps if kp.name == tail_name), None)
-                    if not kp:
-                        kp = KPEntity(id='2:' + str(shortuuid.uuid()), name=tail_name, type='', marginalized=True)
-                        self.knowledgepoints.append(kp)
-                        tail = kp
-                if head and tail:
-                    for relation in head.relations:
-                        if relation.type == rela.get('relation') and relation.tail.name == tail.name:  # 确保没有重复的关系
-                            break
-                        else:
-                            head.relations.append(
-                                KPRelation(id='3:' + str(shortuuid.uuid()),
-                                            type=rela['relation'],
-                                            tail=tail))
-            return center_kps
-
-        # 知识抽取
-        for index, bookmark in tqdm(enumerate(self.flatten_bookmarks()), total=len(self.flatten_bookmarks()), desc='知识抽取'):
+                head_name, tail_name, relation_type = rela.get('head'), rela.get('tail'), rela.get('relation')
+                if head_name and tail_name and relation_type:
+                    self.knowledgepoints.add_relation(get_or_create(head_name), relation_type, get_or_create(tail_name))
+            return list(center_kps.values())
+
+        journal_ = ExtractionJournal(journal) if journal else None
+        if journal_ is not None and len(journal_) != 0:
+            logger.info(f'从抽取日志中回放 {len(journal_)} 个片段')
+
+        # 预先确定需要抽取的书签, 由解析器统一规划需要解析的页面, 避免书签边界页面被重复解析
+        targets: list[tuple[int, BookMark]] = []
+        for index, bookmark in enumerate(self.flatten_bookmarks()):
             if not bookmark.subs:  # 表示最后一级书签 subs为空数组需要设置知识点
-                logger.info('子章节: ' + bookmark.title)
-                if index < self.checkpoint['extract_index'] and checkpoint:
-                    logger.info('已跳过')
+                if (index < self.checkpoint['extract_index'] and checkpoint) or bookmark.title in CONFIG['IGNORE_PAGE']:
+                    logger.info(f'子章节: {bookmark.title} 已跳过')
                     continue
-                if bookmark.title in CONFIG['IGNORE_PAGE']:
-                    logger.info('已跳过')
+                targets.append((index, bookmark))
+        # 全部片段都已记录在日志中的书签直接回放, 不再解析
+        journaled = {index: total for index, bookmark in targets
+                     if journal_ is not None and (total := journal_.get_total(index, bookmark)) is not None}
+        parsed = [bookmark for index, bookmark in targets if index not in journaled]
+        contents_iter = self.parser.iter_contents(parsed)
+
+        def get_chunks() -> Generator[tuple[int, BookMark, list[str | None]], None, None]:
+            # 按文档顺序产出需要抽取的书签及其文本片段, 与 contents_iter 产出的内容一一对应
+            for index, bookmark in targets:
+                logger.info('子章节: ' + bookmark.title)
+                if index in journaled:
+                    yield index, bookmark, [None] * journaled[index]
                     continue
-                contents = self.parser.get_contents(bookmark)
-                kps: list[KPEntity] = []
+                contents = next(contents_iter)
                 texts = []
                 for idx, content in enumerate(contents):
                     texts.append(content.content)
@@ -201,19 +250,43 @@ class Document:
                     elif idx != len(contents) - 1 and contents[idx + 1].type == ContentType.Title:
                         texts[-1] += '\n'
                 contents = merge(texts, n=text_length)  # 优化换行位置
-                for content in contents:
-                    if len(content) != 0:
-                        logger.info('输入片段: \n' + content)
-                        try:
-                            entities: list[KPEntity] = get_knowledgepoints_by_llm(
-                                self,
-                                content)
-                        except Exception as e:
-                            raise e
-                        else:
-                            kps.extend(entities)
-                self.checkpoint['extract_index'] = index
-                bookmark.subs = list({kp.id: kp for kp in kps}.values())  # 去重
+                yield index, bookmark, [content for content in contents if len(content) != 0]
+
+        # 知识抽取: 最多 concurrency 个片段同时调用大模型, 按提交顺序依次合并, 书签的全部片段合并完成后才更新断点
+        pending: deque[tuple[int, BookMark, list[KPEntity], bool, Future | None]] = deque()
+
+        def merge_pending(limit: int) -> None:
+            while len(pending) > limit:
+                index, bookmark, kps, last, future = pending.popleft()
+                if future is not None:
+                    kps.extend(merge_knowledgepoints(self, *future.result()))
+                if last:
+                    self.checkpoint['extract_index'] = index
+                    bookmark.subs = list({kp.id: kp for kp in kps}.values())  # 去重
+                    if index not in journaled:  # 进度条只统计实际解析和抽取的书签
+                        progress.update()
+
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor, tqdm(total=len(parsed), desc='知识抽取') as progress:
+                try:
+                    for index, bookmark, chunks in get_chunks():
+                        kps: list[KPEntity] = []  # 同一书签的各片段共享
+                        if not chunks:
+                            pending.append((index, bookmark, kps, True, None))
+                        for position, content in enumerate(chunks):
+                            if content is not None:
+                                logger.info('输入片段: \n' + content)
+                            pending.append((index, bookmark, kps, position == len(chunks) - 1, submit(index, bookmark, position, chunks)))
+                            merge_pending(concurrency)
+                    merge_pending(0)
+                except Exception as e:
+                    for *_, future in pending:
+                        if future is not None:
+                            future.cancel()
+                    raise e
+        finally:  # 等待线程池中的抽取全部结束后再关闭日志
+            if journal_ is not None:
+                journal_.close()
 
         # 属性值总结
         for entity in tqdm(self.knowledgepoints, desc='属性总结'):
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# Create Date: 2026/10/17
+# Author: wangtao <wangtao.cpu@gmail.com>
+# File Name: course_graph/parser/journal.py
+# Description: 知识抽取结果日志
+
+import os
+import json
+import hashlib
+import threading
+from .types import BookMark
+
+
+class ExtractionJournal:
+
+    def __init__(self, path: str) -> None:
+        """ 只追加的知识抽取结果日志 (JSONL), 每个文本片段抽取完成后立即写入一行。
+        以书签在扁平化列表中的序号、标题、页码范围和片段序号作为键, 重新解析同一文档即可恢复, 片段内容哈希只用于校验。
+        中断后重新运行时直接回放已记录的结果, 全部片段都已记录的书签不再解析页面, 从未完成的片段继续抽取
+
+        Args:
+            path (str): 日志文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:  # 写入过程中断导致的不完整行
+                        continue
+                    self._entries[entry['key']] = entry
+        elif dirname := os.path.dirname(path):
+            os.makedirs(dirname, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def get_key(index: int, bookmark: BookMark, position: int) -> str:
+        """ 生成日志键
+
+        Args:
+            index (int): 书签在扁平化书签列表中的序号
+            bookmark (BookMark): 片段所属书签
+            position (int): 片段在书签中的序号
+
+        Returns:
+            str: 日志键
+        """
+        return f'{index}:{bookmark.title}:{bookmark.page_start.index}-{bookmark.page_end.index}:{position}'
+
+    @staticmethod
+    def _get_hash(content: str) -> str:
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, content: str = None) -> tuple[dict, dict, list] | None:
+        """ 读取已记录的抽取结果
+
+        Args:
+            key (str): 日志键
+            content (str, optional): 片段内容, 与记录的哈希不一致时视为未记录. Defaults to None 即不校验.
+
+        Returns:
+            tuple[dict, dict, list] | None: 实体、属性和关系, 未记录时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or (content is not None and entry.get('hash') != self._get_hash(content)):
+            return None
+        return tuple(entry['result'])
+
+    def get_total(self, index: int, bookmark: BookMark) -> int | None:
+        """ 获取书签的片段数量
+
+        Args:
+            index (int): 书签在扁平化书签列表中的序号
+            bookmark (BookMark): 书签
+
+        Returns:
+            int | None: 片段数量, 书签的片段没有全部记录时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(self.get_key(index, bookmark, 0))
+            if entry is None or not entry.get('total'):
+                return None
+            total = entry['total']
+            if all(self.get_key(index, bookmark, position) in self._entries for position in range(1, total)):
+                return total
+            return None
+
+    def append(self, key: str, content: str, total: int, result: tuple[dict, dict, list]) -> None:
+        """ 记录一个片段的抽取结果, 可以在多个线程中同时调用
+
+        Args:
+            key (str): 日志键
+            content (str): 片段内容
+            total (int): 所属书签的片段数量
+            result (tuple[dict, dict, list]): 实体、属性和关系
+        """
+        entry = {'key': key, 'hash': self._get_hash(content), 'total': total, 'result': result}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._entries[key] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        """ 关闭日志文件
+        """
+        with self._lock:
+            self._file.close()
+
+    def __repr__(self) -> str:
+        return f'ExtractionJournal(path="{self.path}", entries={len(self)})'
@@ -8,6 +8,7 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from .document import Document
 from .types import BookMark, Content
+from typing import Generator
 
 
 class Parser(ABC):
@@ -45,6 +46,18 @@ class Parser(ABC):
         """
         raise NotImplementedError
 
+    def iter_contents(self, bookmarks: list[BookMark]) -> Generator[list[Content], None, None]:
+        """ 依次获取多个书签下的所有内容
+
+        Args:
+            bookmarks (list[BookMark]): 书签列表
+
+        Returns:
+            Generator[list[Content], None, None]: 与书签一一对应的内容列表
+        """
+        for bookmark in bookmarks:
+            yield self.get_contents(bookmark)
+
     def get_document(self) -> Document:
         """ 获取文档
 
@@ -5,5 +5,7 @@
 # Description: PDF文档解析器接口
 
 from .pdf_parser import PDFParser
-from .structure_model import PaddleStructure, StructureModel, LayoutYOLO
+from .structure_model import PaddleStructure, StructureModel, LayoutYOLO, LayoutYOLOOnnx
 from .ocr_model import OCRModel, PaddleOCR, GOT
+from .page_cache import PageCache
+from .model_server import ModelServer, RemoteStructureModel, RemoteOCRModel
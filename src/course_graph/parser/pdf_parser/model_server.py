@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Create Date: 2026/10/17
+# Author: wangtao <wangtao.cpu@gmail.com>
+# File Name: course_graph/parser/pdf_parser/model_server.py
+# Description: 常驻的布局分析和 OCR 模型服务及其客户端
+
+import io
+import threading
+import cv2
+import numpy as np
+from numpy import ndarray
+from .structure_model import StructureModel, StructureResult, PaddleStructure
+from .ocr_model import OCRModel, PaddleOCR
+from .page_cache import get_identity
+
+
+def encode_images(imgs: list[ndarray]) -> bytes:
+    """ 将一批图像编码为 npz 格式, 保留原始像素避免重复压缩
+
+    Args:
+        imgs (list[ndarray]): opencv (BGR) 图像对象列表
+
+    Returns:
+        bytes: 编码后的数据
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, *imgs)
+    return buffer.getvalue()
+
+
+def decode_images(data: bytes) -> list[ndarray]:
+    """ 解码 npz 格式的一批图像
+
+    Args:
+        data (bytes): 编码后的数据
+
+    Returns:
+        list[ndarray]: opencv (BGR) 图像对象列表
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        return [npz[f'arr_{i}'] for i in range(len(npz.files))]
+
+
+class ModelServer:
+
+    def __init__(self,
+                 structure_model: StructureModel = None,
+                 ocr_model: OCRModel = None,
+                 host: str = '127.0.0.1',
+                 port: int = 8010,
+                 warmup: bool = True) -> None:
+        """ 常驻的模型服务, 在多次解析之间保持布局分析模型和 OCR 模型处于加载状态
+
+        Args:
+            structure_model (StructureModel, optional): 布局分析模型. Defaults to None 即 PaddleStructure().
+            ocr_model (OCRModel, optional): OCR 模型. Defaults to None 即 PaddleOCR().
+            host (str, optional): 服务地址, 只在本机使用. Defaults to '127.0.0.1'.
+            port (int, optional): 服务端口. Defaults to 8010.
+            warmup (bool, optional): 启动前先用空白图像推理一次, 完成推理引擎的预热. Defaults to True.
+        """
+        from fastapi import FastAPI, Request
+        from fastapi.concurrency import run_in_threadpool
+
+        self.structure_model = structure_model or PaddleStructure()
+        self.ocr_model = ocr_model or PaddleOCR()
+        self.host = host
+        self.port = port
+        self._lock = threading.Lock()  # 模型推理不是线程安全的, 请求依次执行
+        # 客户端使用服务端模型的标识作为页面缓存键的一部分, 服务端更换模型或参数后不会命中旧的缓存
+        self._identities = {
+            'structure_identity': get_identity(self.structure_model),
+            'ocr_identity': get_identity(self.ocr_model)
+        }
+
+        if warmup:
+            blank = np.full((640, 640, 3), 255, dtype=np.uint8)
+            self.structure_model.predict_batch([blank])
+            self.ocr_model.predict_batch([blank])
+
+        self.app = FastAPI()
+
+        @self.app.get('/health')
+        async def health() -> dict:
+            return {
+                'structure_model': type(self.structure_model).__name__,
+                'ocr_model': type(self.ocr_model).__name__,
+                'input_size': self.structure_model.input_size,
+                **self._identities
+            }
+
+        @self.app.post('/structure')
+        async def structure(request: Request) -> list:
+            imgs = decode_images(await request.body())
+            return await run_in_threadpool(self._predict, self.structure_model, imgs)
+
+        @self.app.post('/ocr')
+        async def ocr(request: Request) -> list:
+            imgs = decode_images(await request.body())
+            return await run_in_threadpool(self._predict, self.ocr_model, imgs)
+
+    def _predict(self, model: StructureModel | OCRModel, imgs: list[ndarray]) -> list:
+        with self._lock:
+            return model.predict_batch(imgs)
+
+    def run(self):
+        """ 启动模型服务 """
+        import uvicorn
+        uvicorn.run(self.app, host=self.host, port=self.port)
+
+
+class RemoteStructureModel(StructureModel):
+
+    def __init__(self, url: str = 'http://127.0.0.1:8010', timeout: float = 300) -> None:
+        """ 使用常驻模型服务进行布局分析
+
+        Args:
+            url (str, optional): 模型服务地址. Defaults to 'http://127.0.0.1:8010'.
+            timeout (float, optional): 请求超时时间 (秒). Defaults to 300.
+        """
+        import httpx  # openai 的依赖, 只在使用模型服务时导入
+
+        super().__init__()
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.client = httpx.Client(timeout=timeout)
+        health = self.client.get(f'{self.url}/health').json()
+        self.input_size = health['input_size']
+        self.server_identity = health['structure_identity']
+
+    def predict(self, img: ndarray) -> list[StructureResult]:
+        return self.predict_batch([img])[0]
+
+    def predict_batch(self, imgs: list[ndarray]) -> list[list[StructureResult]]:
+        response = self.client.post(f'{self.url}/structure', content=encode_images(imgs))
+        response.raise_for_status()
+        return [[{**block, 'bbox': tuple(block['bbox'])} for block in blocks] for blocks in response.json()]
+
+
+class RemoteOCRModel(OCRModel):
+
+    def __init__(self, url: str = 'http://127.0.0.1:8010', timeout: float = 300) -> None:
+        """ 使用常驻模型服务进行 OCR 识别
+
+        Args:
+            url (str, optional): 模型服务地址. Defaults to 'http://127.0.0.1:8010'.
+            timeout (float, optional): 请求超时时间 (秒). Defaults to 300.
+        """
+        import httpx  # openai 的依赖, 只在使用模型服务时导入
+
+        super().__init__()
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.client = httpx.Client(timeout=timeout)
+        self.server_identity = self.client.get(f'{self.url}/health').json()['ocr_identity']
+
+    def predict(self, img: str | ndarray) -> str:
+        return self.predict_batch([img])[0][0]
+
+    def predict_batch(self, imgs: list[str | ndarray]) -> list[tuple[str, float | None]]:
+        imgs = [cv2.imread(img) if isinstance(img, str) else img for img in imgs]
+        response = self.client.post(f'{self.url}/ocr', content=encode_images(imgs))
+        response.raise_for_status()
+        return [(text, score) for text, score in response.json()]
@@ -5,50 +5,161 @@
 # Description: OCR 模型封装
 
 from abc import ABC, abstractmethod
-from paddleocr import PaddleOCR as Paddle
-from modelscope import AutoModel, AutoTokenizer
 import logging
 from contextlib import redirect_stdout
 import os
 import re
 import time
+import copy
+import cv2
+from PIL import Image
+import numpy as np
+from numpy import ndarray
 from ...llm import Qwen
+from ..utils import ReconstructMixin
 
 logging.getLogger("transformers").setLevel(logging.CRITICAL)
 
 
-class OCRModel(ABC):
+class OCRModel(ReconstructMixin, ABC):
 
     @abstractmethod
-    def predict(self, img_path: str) -> str:
-        """ OCR 识别
+    def predict(self, img: str | ndarray) -> str:
+        """ OCR 识别, 接受图片路径或 opencv (BGR) 图像对象
         """
         raise NotImplementedError
 
-    def __call__(self, img_path) -> str:
-        return self.predict(img_path)
+    def predict_batch(self, imgs: list[str | ndarray]) -> list[tuple[str, float | None]]:
+        """ 批量 OCR 识别, 默认逐张识别, 支持批量推理的模型应重写该方法
+
+        Args:
+            imgs (list[str | ndarray]): 图片路径或 opencv (BGR) 图像对象列表
+
+        Returns:
+            list[tuple[str, float | None]]: 识别文本和置信度, 不提供置信度的模型置信度为 None
+        """
+        return [(self.predict(img), None) for img in imgs]
+
+    def __call__(self, img: str | ndarray) -> str:
+        return self.predict(img)
 
 
 class PaddleOCR(OCRModel):
 
-    def __init__(self) -> None:
+    def __init__(self, batch_size: int = 16, detect: bool = True, orientation_samples: int = 8) -> None:
         """ 飞桨 OCR 模型 ref: https://github.com/PaddlePaddle/PaddleOCR/
-        """
-        self.paddle = Paddle(lang="ch", show_log=False, use_angle_cls=True)
 
-    def predict(self, img_path: str) -> str:
-        res = self.paddle.ocr(img_path)[0]
+        Args:
+            batch_size (int, optional): 方向分类和文字识别的批大小. Defaults to 16.
+            detect (bool, optional): 批量识别时是否使用文本检测模型切分文本行, 否则认为输入已经是布局分析得到的文本区块,
+                通过水平投影切分文本行后只运行识别模型. Defaults to True.
+            orientation_samples (int, optional): 不使用文本检测时, 抽样进行方向分类的文本行数量, 多数文本行倒置时才对全部文本行进行方向分类. Defaults to 8.
+        """
+        from paddleocr import PaddleOCR as Paddle  # 推理后端均延迟到构造模型时导入
+        self.paddle = Paddle(lang="ch", show_log=False, use_angle_cls=True,
+                             rec_batch_num=batch_size, cls_batch_num=batch_size)
+        self.detect = detect
+        self.orientation_samples = orientation_samples
+
+    def predict(self, img: str | ndarray) -> str:
+        if not self.detect:
+            return self.predict_batch([img])[0][0]
+        res = self.paddle.ocr(img)[0]
         if res is not None:
             sts = [line[1][0] for line in res]
             return re.sub(r'[^\S\n]+', '', ''.join(sts))
         return ''
 
+    @staticmethod
+    def _split_lines(img: ndarray, min_height: int = 4, padding: int = 3) -> list[ndarray]:
+        """ 通过水平投影将文本区块切分为文本行
+
+        Args:
+            img (ndarray): 文本区块图像
+            min_height (int, optional): 文本行最小高度, 更矮的视为噪点. Defaults to 4.
+            padding (int, optional): 文本行四周保留的空白. Defaults to 3.
+
+        Returns:
+            list[ndarray]: 文本行图像
+        """
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        ink = binary > 0
+        h, w = ink.shape
+        rows = np.concatenate(([False], ink.sum(axis=1) > max(1, w * 0.002), [False]))
+        edges = np.flatnonzero(np.diff(rows.astype(np.int8)))  # 依次为各文本行的起止位置
+        lines: list[ndarray] = []
+        for y1, y2 in zip(edges[::2], edges[1::2]):
+            if y2 - y1 < min_height:
+                continue
+            cols = np.flatnonzero(ink[y1:y2].any(axis=0))
+            x1, x2 = max(0, cols[0] - padding), min(w, cols[-1] + 1 + padding)
+            lines.append(img[max(0, y1 - padding):min(h, y2 + padding), x1:x2])
+        return lines
+
+    def _classify_orientation(self, lines: list[ndarray]) -> list[ndarray]:
+        """ 抽样判断文本行方向, 多数文本行倒置时才对全部文本行进行方向分类和旋转
+
+        Args:
+            lines (list[ndarray]): 文本行图像
+
+        Returns:
+            list[ndarray]: 方向校正后的文本行图像
+        """
+        step = max(1, len(lines) // self.orientation_samples)
+        samples = lines[::step][:self.orientation_samples]
+        _, cls_res, _ = self.paddle.text_classifier(list(samples))
+        if sum('180' in label for label, _ in cls_res) * 2 > len(samples):
+            lines, _, _ = self.paddle.text_classifier(lines)
+        return lines
+
+    def predict_batch(self, imgs: list[str | ndarray]) -> list[tuple[str, float | None]]:
+        from paddleocr.tools.infer.predict_system import sorted_boxes
+        from paddleocr.tools.infer.utility import get_rotate_crop_image
+
+        # 逐张切分文本行, 所有图片的文本行合并后统一进行方向分类和识别
+        lines: list[ndarray] = []
+        owners: list[int] = []  # 文本行所属的图片序号
+        for idx, img in enumerate(imgs):
+            if isinstance(img, str):
+                img = cv2.imread(img)
+            if not self.detect:
+                for line in self._split_lines(img):
+                    lines.append(line)
+                    owners.append(idx)
+                continue
+            dt_boxes, _ = self.paddle.text_detector(img)
+            if dt_boxes is None:
+                continue
+            for box in sorted_boxes(dt_boxes):
+                lines.append(get_rotate_crop_image(img, copy.deepcopy(box)))
+                owners.append(idx)
+
+        texts: list[list[str]] = [[] for _ in imgs]
+        scores: list[list[float]] = [[] for _ in imgs]
+        if lines:
+            if self.paddle.use_angle_cls:
+                if self.detect:
+                    lines, _, _ = self.paddle.text_classifier(lines)
+                else:
+                    lines = self._classify_orientation(lines)
+            rec_res, _ = self.paddle.text_recognizer(lines)
+            for idx, (text, score) in zip(owners, rec_res):
+                if score >= self.paddle.drop_score:
+                    texts[idx].append(text)
+                    scores[idx].append(score)
+        return [
+            (re.sub(r'[^\S\n]+', '', ''.join(sts)), sum(scs) / len(scs) if scs else 0.0)
+            for sts, scs in zip(texts, scores)
+        ]
+
 
 class GOT(OCRModel):
 
     def __init__(self, model_path: str, device: str = 'cuda') -> None:
         """ GOT-OCR 2.0 模型 ref: https://github.com/Ucas-HaoranWei/GOT-OCR2.0
         """
+        from modelscope import AutoModel, AutoTokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(model_path,
                                                        trust_remote_code=True)
         self.model = AutoModel.from_pretrained(
@@ -78,11 +189,19 @@ class GOT(OCRModel):
         def __exit__(self, exc_type, exc_val, exc_tb):
             self.model.generate = self.original_generate
 
-    def predict(self, img_path: str) -> str:
+    def _chat(self, img: str | ndarray) -> str:
+        if isinstance(img, ndarray):  # 直接传入 PIL 图像对象
+            image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            res, _ = self.model.chat(self.tokenizer, image, ocr_type='ocr', gradio_input=True)
+        else:
+            res, _ = self.model.chat(self.tokenizer, img, ocr_type='ocr')
+        return res
+
+    def predict(self, img: str | ndarray) -> str:
         with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
             timmout = False
             start_time = time.time()
-            res, _ = self.model.chat(self.tokenizer, img_path, ocr_type='ocr')
+            res = self._chat(img)
             if time.time() - start_time > 30:
                 timmout = True
             res = res.replace('\n', '').replace('\u3000', ' ')
@@ -91,7 +210,7 @@ class GOT(OCRModel):
                 retry = 0
                 while retry < 3:  # 不断尝试提高温度
                     with self.OverrideGenerate(self.model, temperature=1.0 * (retry + 1), do_sample=True):
-                        res, _ = self.model.chat(self.tokenizer, img_path, ocr_type='ocr')
+                        res = self._chat(img)
                     if not self.unreadable_pattern.search(res):
                         break
                     retry += 1
@@ -110,5 +229,6 @@ class QwenOCR(OCRModel):
         """
         self.model = Qwen(name='qwen-vl-ocr', api_key=api_key)
 
-    def predict(self, img_path: str) -> str:
-        return self.model.image_chat([img_path], 'Read all the text in the image.')
+    def predict(self, img: str | ndarray) -> str:
+        res, _ = self.model.image_chat([img], 'Read all the text in the image.')
+        return res
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Create Date: 2026/10/17
+# Author: wangtao <wangtao.cpu@gmail.com>
+# File Name: course_graph/parser/pdf_parser/page_cache.py
+# Description: 页面解析结果缓存
+
+import os
+import time
+import json
+import pickle
+import sqlite3
+import hashlib
+import threading
+from typing import Any
+from loguru import logger
+from functools import partial
+from types import CodeType, FunctionType, MethodType
+from ..types import Page
+
+
+def _get_code_identity(code: CodeType) -> str:
+    """ 获取代码对象的标识, 嵌套的代码对象 (lambda、内部函数) 递归处理, 避免引入内存地址
+
+    Args:
+        code (CodeType): 代码对象
+
+    Returns:
+        str: 标识
+    """
+    consts = [_get_code_identity(const) if isinstance(const, CodeType) else repr(const) for const in code.co_consts]
+    raw = repr((code.co_code, consts, code.co_names, code.co_varnames))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_identity(obj: Any) -> str | None:
+    """ 获取对象的标识, 用于区分不同的模型、函数和参数配置
+
+    Args:
+        obj (Any): 模型、大模型或函数等对象
+
+    Returns:
+        str | None: 标识
+    """
+    if obj is None:
+        return None
+    if isinstance(obj, partial):  # 偏函数, 使用原函数和绑定的参数区分
+        return (f'functools.partial({get_identity(obj.func)}, '
+                f'{[get_identity(arg) for arg in obj.args]!r}, '
+                f'{sorted((key, get_identity(value)) for key, value in obj.keywords.items())!r})')
+    if isinstance(obj, MethodType):  # 绑定方法, 使用所属对象区分
+        return f'{get_identity(obj.__self__)}.{obj.__name__}'
+    if isinstance(obj, FunctionType):  # 函数, 同名的 lambda 或内部函数使用代码、默认参数和闭包变量区分
+        identity = f'{obj.__module__}.{obj.__qualname__}'
+        if '<' in obj.__qualname__:  # <lambda> 或 <locals>
+            closure = [get_identity(cell.cell_contents) for cell in obj.__closure__ or ()]
+            identity += (f'[{_get_code_identity(obj.__code__)}]'
+                         f'{[get_identity(value) for value in obj.__defaults__ or ()]!r}{closure!r}')
+        return identity
+    if isinstance(obj, (str, int, float, bool, bytes, tuple, list, dict)):  # 参数值
+        return repr(obj)
+    if callable(obj) and hasattr(obj, '__qualname__'):  # 类或内置函数
+        return f'{obj.__module__}.{obj.__qualname__}'
+    identity = f'{type(obj).__module__}.{type(obj).__qualname__}'
+    if hasattr(obj, '_init_args'):  # 模型, 使用构造参数区分
+        args, kwargs = obj._init_args
+        identity += f'{args!r}{sorted(kwargs.items())!r}'
+    elif callable(obj):
+        logger.warning(f'无法区分 {identity} 对象的参数配置, 修改其参数后页面缓存可能返回旧的解析结果')
+    if server_identity := getattr(obj, 'server_identity', None):  # 远程模型, 使用服务端模型的标识区分
+        identity += f'<{server_identity}>'
+    if model := getattr(obj, 'model', None):  # 大模型, 使用模型名称区分
+        if isinstance(model, str):
+            identity += f'({model})'
+    return identity
+
+
+class PageCache:
+
+    def __init__(self, cache_dir: str = '.cache/page_cache', max_size: int = 1024 ** 3) -> None:
+        """ 基于 SQLite 的页面解析结果缓存, 以文档内容哈希、页码和影响解析结果的参数作为键
+
+        Args:
+            cache_dir (str, optional): 缓存目录. Defaults to '.cache/page_cache'.
+            max_size (int, optional): 缓存大小上限 (字节), 超出后淘汰最久未使用的页面. Defaults to 1GB.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'pages.db'), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                atime REAL NOT NULL
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pages_atime ON pages (atime)')
+        self._conn.commit()
+
+    @staticmethod
+    def get_key(file_hash: str, page_index: int, settings: dict) -> str:
+        """ 生成缓存键
+
+        Args:
+            file_hash (str): 文档内容哈希
+            page_index (int): 页码
+            settings (dict): 影响解析结果的参数
+
+        Returns:
+            str: 缓存键
+        """
+        raw = json.dumps([file_hash, page_index, settings], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Page | None:
+        """ 读取缓存的页面
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            Page | None: 页面, 未命中时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM pages WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE pages SET atime = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key: str, page: Page) -> None:
+        """ 缓存页面, 超出大小上限时淘汰最久未使用的页面
+
+        Args:
+            key (str): 缓存键
+            page (Page): 页面
+        """
+        value = pickle.dumps(page)
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO pages (key, value, size, atime) VALUES (?, ?, ?, ?)',
+                               (key, value, len(value), time.time()))
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+            if total > self.max_size:
+                evicted = []
+                for key_, size in self._conn.execute('SELECT key, size FROM pages ORDER BY atime'):
+                    if total <= self.max_size:
+                        break
+                    evicted.append((key_,))
+                    total -= size
+                self._conn.executemany('DELETE FROM pages WHERE key = ?', evicted)
+            self._conn.commit()
+
+    @property
+    def size(self) -> int:
+        """ 缓存当前占用的大小 (字节)
+        """
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+
+    def clear(self) -> None:
+        """ 清空缓存和命中统计
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM pages')
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        """ 关闭缓存数据库连接
+        """
+        self._conn.close()
+
+    def __repr__(self) -> str:
+        return f'PageCache(cache_dir="{self.cache_dir}", hits={self.hits}, misses={self.misses})'
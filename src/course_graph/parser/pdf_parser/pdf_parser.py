@@ -6,6 +6,7 @@
 
 from .structure_model import *
 from .ocr_model import *
+from .page_cache import PageCache, get_identity
 import shortuuid
 from ..parser import Parser
 from ..types import Page, Content, ContentType
@@ -14,14 +15,24 @@ from PIL import Image
 import numpy as np
 import cv2
 import re
+import ast
+import json
 from ...llm import LLM
 from ...llm.prompt import VLPrompt, ParserPrompt
-import os
-import shutil
-from course_graph._core import get_list, get_longest_seq
+from course_graph._core import get_list, get_longest_seq, heading_level, parse_toc
 from ..types import BookMark, PageIndex
-from typing import Callable
+from typing import Callable, Generator
 from numpy import ndarray
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import hashlib
+from dataclasses import dataclass, field
+from loguru import logger
+from collections import deque, Counter
+from itertools import islice
+import threading
+import queue
 
 
 class PDFParser(Parser):
@@ -29,9 +40,9 @@ class PDFParser(Parser):
     def __init__(
             self,
             pdf_path: str,
-            ocr_model: OCRModel = PaddleOCR(),
+            ocr_model: OCRModel = None,
             ocr_priority: bool = False,
-            structure_model: StructureModel = PaddleStructure(),
+            structure_model: StructureModel = None,
             parser_prompt: ParserPrompt = ParserPrompt(),
             vl_prompt: VLPrompt = VLPrompt(),
             vlm: LLM = None,
@@ -39,15 +50,20 @@ class PDFParser(Parser):
             anchor_priority: bool = False,
             sharpen: Literal['USM', 'Laplacian'] = None,
             enhance_fn: Callable[[ndarray], ndarray] = None,
+            workers: int = 1,
+            page_cache: PageCache = None,
+            batch_size: int = 1,
+            vlm_concurrency: int = 4,
+            fast: bool = False,
             **kwargs
     ) -> None:
         """ pdf文档解析器
 
         Args:
             pdf_path (str): pdf文档路径
-            ocr_model (OCRModel, optional): OCR 模型. Defaults to PaddleOCR().
+            ocr_model (OCRModel, optional): OCR 模型. Defaults to None 即首次使用时创建 PaddleOCR().
             ocr_priority (bool, optional): 获取文字内容时优先使用 OCR模型, 否则优先直接读取. Defaults to False.
-            structure_model (StructureModel, optional): 布局分析模型. Defaults to Paddle().
+            structure_model (StructureModel, optional): 布局分析模型. Defaults to None 即首次使用时创建 PaddleStructure().
             parser_prompt (ParserPrompt, optional): 解析提示词. Defaults to ParserPrompt().
             vl_prompt (VLPrompt, optional): 视觉模型提示词. Defaults to VLPrompt().
             vlm ( LLM, optional): 视觉模型. Default to None.
@@ -55,13 +71,31 @@ class PDFParser(Parser):
             anchor_priority (bool, optional): 优先使用锚点定位. Defaults to False.
             sharpen (Literal['USM', 'Laplacian'] | None, optional): 锐化处理算法. Defaults to None.
             enhance_fn (Callable[[ndarray], ndarray], optional): 图像增强函数. Defaults to None.
+            workers (int, optional): 并行解析页面的进程数, 每个进程持有独立的文档句柄和模型, 此时 enhance_fn 需要可被序列化.
+                工作进程以 spawn 方式启动并重新导入主模块, 脚本中需要将解析代码放在 if __name__ == '__main__': 下. Defaults to 1.
+            page_cache (PageCache, optional): 页面解析结果缓存. Defaults to None.
+            batch_size (int, optional): 页面批处理大小, 预先渲染一批页面, 合并进行布局分析, 其中需要 OCR 的文本区块也合并为一次批量识别. Defaults to 1.
+            vlm_concurrency (int, optional): 同时进行的视觉模型请求数. Defaults to 4.
+            fast (bool, optional): 快速模式, 文字层可信的页面不经渲染和布局分析, 直接根据文字层的字号、字重生成内容, 其余页面仍使用图像解析. Defaults to False.
             **kwargs (dict, optional): 其它细粒度控制参数.
         """
         super().__init__(pdf_path)
         self._pdf = fitz.open(pdf_path)
+        self._fitz_lock = threading.RLock()  # PyMuPDF 不支持多线程, 所有 fitz 调用依次执行
 
-        self.structure_model = structure_model
-        self.ocr_model = ocr_model
+        self._structure_model = structure_model
+        self._ocr_model = ocr_model
+        # 缓存键中的模型和可调用对象标识在构造时计算一次, 默认模型使用固定标识, 不受模型是否已经加载影响
+        self._identities = {
+            'ocr_model': get_identity(ocr_model) or 'default:PaddleOCR',
+            'structure_model': get_identity(structure_model) or 'default:PaddleStructure',
+            'enhance_fn': get_identity(enhance_fn),
+            'parser_prompt': get_identity(parser_prompt),
+            'vl_prompt': get_identity(vl_prompt),
+            'vlm': get_identity(vlm),
+            'llm': get_identity(llm)
+        }
+        self._model_lock = threading.Lock()
         self.ocr_priority = ocr_priority
 
         self.parser_prompt = parser_prompt
@@ -74,11 +108,38 @@ class PDFParser(Parser):
         self.enhance_fn = enhance_fn
         self.kwargs = kwargs
 
+        self.workers = workers
+        self.batch_size = batch_size
+        self.vlm_concurrency = vlm_concurrency
+        self._executor: ProcessPoolExecutor | None = None
+
+        self.fast = fast
+        self._body_font_size: float | None = None
+
+        self.page_cache = page_cache
+        self._file_hash: str | None = None
+
         self.outline: list[list] = self._get_outline()
-        
-        self.cache_path = '.cache/pdf_cache'
-        if not os.path.exists(self.cache_path):
-            os.makedirs(self.cache_path)
+
+    @property
+    def structure_model(self) -> StructureModel:
+        """ 布局分析模型, 未指定时在首次使用时创建默认模型
+        """
+        if self._structure_model is None:
+            with self._model_lock:
+                if self._structure_model is None:
+                    self._structure_model = PaddleStructure()
+        return self._structure_model
+
+    @property
+    def ocr_model(self) -> OCRModel:
+        """ OCR 模型, 未指定时在首次使用时创建默认模型
+        """
+        if self._ocr_model is None:
+            with self._model_lock:
+                if self._ocr_model is None:
+                    self._ocr_model = PaddleOCR()
+        return self._ocr_model
 
     def _get_outline(self) -> list[list]:
         """ 从 pdf 中读取大纲层级
@@ -88,11 +149,11 @@ class PDFParser(Parser):
         """
         outline = []
         for item in self._pdf.get_toc(simple=False):
-            h = self._pdf[item[2] - 1].get_pixmap().height  # 宽高一律采用像素层面
             if self.anchor_priority:
                 match item[3]['kind']:
                     case 4:
                         try:
+                            h = self._pdf[item[2] - 1].get_pixmap().height  # 宽高一律采用像素层面
                             xref = item[3]['xref']
                             t_xref = int(self._pdf.xref_get_key(xref, 'A')[1].split()[0])
                             fitH = int(self._pdf.xref_get_key(t_xref, 'D')[1][1:-1].split()[-1])
@@ -113,58 +174,157 @@ class PDFParser(Parser):
     def close(self) -> None:
         """ 关闭文档
         """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
         self._pdf.close()
-        shutil.rmtree(self.cache_path)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """ 获取解析页面的进程池, 进程池在首次使用时创建并在关闭文档前一直保留, 使各进程中的模型保持加载状态
+
+        Returns:
+            ProcessPoolExecutor: 进程池
+        """
+        if self._executor is None:
+            kwargs = {
+                'ocr_model': self._ocr_model,  # 未指定的默认模型在工作进程中首次使用时创建
+                'ocr_priority': self.ocr_priority,
+                'structure_model': self._structure_model,
+                'parser_prompt': self.parser_prompt,
+                'vl_prompt': self.vl_prompt,
+                'vlm': self.vlm,
+                'llm': self.llm,
+                'anchor_priority': self.anchor_priority,
+                'sharpen': self.sharpen,
+                'enhance_fn': self.enhance_fn,
+                'batch_size': self.batch_size,
+                'vlm_concurrency': self.vlm_concurrency,
+                'fast': self.fast,
+                **self.kwargs
+            }
+            # 文档句柄和推理引擎都不能安全地 fork, 使用 spawn 启动并在子进程中重新加载模型
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.file_path, kwargs))
+        return self._executor
 
     def get_catalogue_index_by_vlm(
             self,
             vlm: LLM,
-            rate: float = 0.1) -> tuple[int, int]:
-        """ 通过视觉模型寻找目录页, 返回目录页起始页和终止页页码 (从0开始编序)
+            rate: float = 0.1,
+            patience: int = 2) -> tuple[int, int]:
+        """ 通过视觉模型寻找目录页, 返回目录页起始页和终止页页码 (从0开始编序)。
+        根据文字层能够明确判断的页面不再询问视觉模型, 其余页面每 vlm_concurrency 页为一组并发询问, 目录页结束后提前停止
 
         Args:
             vlm (LLM): 视觉模型
             rate (float, optional): 查询前 ratio 比例的页面. Defaults to 0.1 即 10%.
+            patience (int, optional): 找到目录页后, 连续遇到多少个非目录页即认为目录已经结束. Defaults to 2.
 
         Returns:
             tuple[int, int]: 目录页起始页和终止页页码
         """
+        prompt_, instruction = self.vl_prompt.get_catalogue_prompt()
+        vlm.instruction = instruction
+
+        def ask(img: ndarray) -> bool:
+            res, _ = vlm.image_chat(img, prompt_)
+            return res.startswith('是')
+
         catalogue = []
-        for index in range(int(self._pdf.page_count * rate)):
-            img = self._get_page_img(index, zoom=2)
-            file_path = os.path.join(self.cache_path, f'{index}.png')
-            Image.fromarray(img).save(file_path)
-            prompt_, instruction = self.vl_prompt.get_catalogue_prompt()
-            vlm.instruction = instruction
-            res, _ = vlm.image_chat(file_path, prompt_)
-            if res.startswith('是'):
-                catalogue.append(index)
-        shutil.rmtree(self.cache_path)
+        misses = 0  # 目录页之后连续的非目录页数量
+        end = int(self._pdf.page_count * rate)
+        executor = ThreadPoolExecutor(max_workers=self.vlm_concurrency)
+        try:
+            index = 0
+            while index < end and not (catalogue and misses >= patience):
+                window = range(index, min(index + self.vlm_concurrency, end))
+                guesses = {i: self._guess_catalogue_by_text(i) for i in window}
+                futures = {i: executor.submit(ask, self._get_page_img(i, zoom=2))
+                           for i in window if guesses[i] is None}
+                for i in window:
+                    if guesses[i] if guesses[i] is not None else futures[i].result():
+                        catalogue.append(i)
+                        misses = 0
+                    elif catalogue:
+                        misses += 1
+                        if misses >= patience:
+                            break
+                index = window.stop
+        finally:  # 提前结束时取消尚未开始的询问, 也不等待正在进行的询问
+            executor.shutdown(wait=False, cancel_futures=True)
 
         return get_longest_seq(catalogue)
 
+    def _guess_catalogue_by_text(self, page_index: int) -> bool | None:
+        """ 根据文字层中以页码结尾的目录行所占比例判断是否为目录页
+
+        Args:
+            page_index (int): 页码
+
+        Returns:
+            bool | None: 是否为目录页, 没有可用文字层或无法明确判断时返回 None
+        """
+        text = self._pdf[page_index].get_text(sort=True)
+        if len(text.strip()) == 0 or '\ufffd' in text:
+            return None
+        lines = [line for line in text.splitlines() if line.strip()]
+        entries = [entry for entry in parse_toc(text) if entry[1] >= 0 and entry[3] >= 0.6]
+        ratio = len(entries) / len(lines)
+        if len(entries) >= 3 and ratio >= self.kwargs.get('catalogue_ratio', 0.5):
+            return True
+        if len(lines) >= 5 and ratio < 0.1:
+            return False
+        return None
+
     def _set_outline(self,
                      lines: list,
                      offset: int,
-                     llm: LLM) -> None:
+                     llm: LLM = None,
+                     levels: list[int | None] = None,
+                     fallback: list[int] = None) -> None:
         """ 设置大纲层级
 
         Args:
             lines (list): 标题和页码数组
             offset (int): 页码偏移
-            llm (LLM): 大模型
+            llm (LLM, optional): 大模型, 用于确定 levels 中未知的层级. Defaults to None.
+            levels (list[int | None], optional): 已经确定的层级, None 表示未知. Defaults to None 即全部由大模型确定.
+            fallback (list[int], optional): 未指定大模型、大模型的回复无法解析或者行数不一致时采用的层级. Defaults to None 即全部为1级.
         """
-        lines_without_index = [line[0] for line in lines]
-        prompt, instruction = self.parser_prompt.get_outline_prompt(lines_without_index)
-        llm.instruction = instruction
-        res, _ = llm.chat(prompt)
-        r2 = get_list(res)
+        if levels is None:
+            levels = [None] * len(lines)
+        if fallback is None:
+            fallback = [1] * len(lines)
+        unresolved = [i for i, level in enumerate(levels) if level is None]
+        if unresolved:  # 只把无法确定层级的标题交给大模型
+            r2 = []
+            if llm is not None:
+                prompt, instruction = self.parser_prompt.get_outline_prompt([lines[i][0] for i in unresolved])
+                llm.instruction = instruction
+                res, _ = llm.chat(prompt)
+                try:
+                    r2 = ast.literal_eval(get_list(res)[0])
+                except (IndexError, ValueError, SyntaxError) as e:
+                    logger.warning(f'大模型返回的大纲层级无法解析, 按字号排名推断: {e}')
+            levels = list(levels)
+            for i in unresolved:
+                levels[i] = fallback[i]
+            if isinstance(r2, (list, tuple)) and len(r2) == len(unresolved):
+                for i, row in zip(unresolved, r2):
+                    try:
+                        levels[i] = int(re.findall(r'\d+', str(row[1]))[0])
+                    except (IndexError, ValueError, TypeError):  # 该行没有层级, 保留推断的层级
+                        pass
+            elif r2:  # 大模型遗漏或合并了标题, 无法逐行对应
+                logger.warning(f'大模型返回 {len(r2)} 行层级, 需要 {len(unresolved)} 行, 按字号排名推断')
 
         outline: list = []
-        for i in range(len(r2)):
-            level = int(re.findall(r'\d+', r2[i][1])[0])
+        for i in range(len(lines)):
             if str(lines[i][1]).isdigit():
-                outline.append([level, lines[i][0], int(lines[i][1]) + offset, (-1, -1)])
+                outline.append([levels[i], lines[i][0], int(lines[i][1]) + offset, (-1, -1)])
         self.outline = outline
 
     def set_outline_by_catalogue(
@@ -172,42 +332,207 @@ class PDFParser(Parser):
             start_index: int,
             end_index: int,
             offset: int,
-            llm: LLM) -> None:
-        """ 手动指定目录页, 通过大模型解析目录页获取大纲层级
+            llm: LLM = None,
+            min_confidence: float = 0.6) -> None:
+        """ 手动指定目录页, 解析目录页获取大纲层级。目录行的标题、页码和层级直接由规则解析, 只有置信度低的行才交给大模型整理
 
         Args:
             start_index (int): 目录页起始页 (从0开始编序)
             end_index (int): 目录页终止页 (包含终止页)
             offset (int): 首页偏移
-            llm (LLM): 大模型
+            llm (LLM, optional): 大模型, 未指定时直接采用规则解析的结果. Defaults to None.
+            min_confidence (float, optional): 置信度低于该值的目录行交给大模型整理. Defaults to 0.6.
         """
 
         self.outline = []
         lines = []
         for index in range(start_index, end_index + 1):
-            page = self.get_page(index)
-            text_contents = '\n'.join(
-                [content.content for content in page.contents]).strip()
-            prompt, instruction = self.parser_prompt.get_directory_prompt(text_contents)
-            llm.instruction = instruction
-            res, _ = llm.chat(prompt)
-            res = res.replace("，", ",")
-            lines.extend(get_list(res))
-        self._set_outline(lines, offset, llm)
+            text = self._pdf[index].get_text(sort=True)
+            if len(text.strip()) == 0 or '\ufffd' in text:  # 没有可用的文字层
+                page = self.get_page(index)
+                text = '\n'.join([content.content for content in page.contents]).strip()
+            run: list[tuple[str, int, int, float]] = []  # 连续的低置信度目录行
+            for entry in parse_toc(text) + [None]:
+                if entry is not None and entry[3] < min_confidence:
+                    run.append(entry)
+                    continue
+                if run:
+                    lines.extend(self._parse_catalogue_by_llm(run, llm))
+                    run = []
+                if entry is not None:
+                    lines.append([entry[0], entry[1]])
+        candidates = [(title, 0, None) for title, _ in lines]
+        self._set_outline(lines, offset, llm,
+                          self._infer_heading_levels(candidates, fill=False),
+                          self._infer_heading_levels(candidates, fill=True))
+
+    def _parse_catalogue_by_llm(self, entries: list[tuple[str, int, int, float]], llm: LLM = None) -> list[list]:
+        """ 使用大模型整理低置信度的目录行
+
+        Args:
+            entries (list[tuple[str, int, int, float]]): parse_toc 得到的目录行
+            llm (LLM, optional): 大模型, 未指定或回复无法解析时保留规则解析出页码的目录行. Defaults to None.
+
+        Returns:
+            list[list]: 标题和页码数组
+        """
+        parsed = [[title, page] for title, page, _, _ in entries if page >= 0]
+        if llm is None:
+            return parsed
+        text_contents = '\n'.join(f'{title} {page}' if page >= 0 else title for title, page, _, _ in entries)
+        prompt, instruction = self.parser_prompt.get_directory_prompt(text_contents)
+        llm.instruction = instruction
+        res, _ = llm.chat(prompt)
+        res = res.replace("，", ",")
+        try:
+            return [list(line) for line in ast.literal_eval(get_list(res)[0])]
+        except (IndexError, ValueError, SyntaxError, TypeError) as e:
+            logger.warning(f'大模型整理的目录无法解析, 保留规则解析的 {len(parsed)} 行: {e}')
+            return parsed
 
     def set_outline_auto(self,
-                         llm: LLM) -> None:
-        """ 使用OCR自动设置大纲层级, 适用于没有目录页的情况
+                         llm: LLM = None) -> None:
+        """ 根据文字层中标题的字号、字重和编号自动设置大纲层级, 适用于没有目录页的情况。
+        没有可用文字层的页面使用布局分析模型和 OCR 寻找标题, 只有无法确定层级的标题才交给大模型判断
 
         Args:
-            llm (LLM): 大模型
+            llm (LLM, optional): 大模型, 未指定时按字号排序推断无法确定的层级. Defaults to None.
         """
-        titles = []
+        body_size = self._get_body_font_size()
+        candidates: list[tuple[str, int, float | None]] = []  # 标题, 页码, 字号 (OCR 得到的标题没有字号)
+        raster_pages: list[int] = []
         for index in range(self._pdf.page_count):
-            img = self._get_page_img(index, zoom=1)
-            res = self.structure_model(img)
-            titles.extend([[block['text'], index] for block in res if block['type'] == 'title'])
-        self._set_outline(titles, 0, llm)
+            pdf_page = self._pdf[index]
+            blocks = [block for block in pdf_page.get_text('dict', flags=fitz.TEXTFLAGS_TEXT, sort=True)['blocks']
+                      if block['type'] == 0]
+            text = ''.join(span['text'] for block in blocks for line in block['lines'] for span in line['spans'])
+            if len(text.strip()) == 0 or '\ufffd' in text:
+                raster_pages.append(index)
+                continue
+            candidates.extend((title, index, size) for title, size in self._get_heading_candidates(pdf_page, blocks, body_size))
+        if raster_pages:
+            candidates.extend(self._get_heading_candidates_by_ocr(raster_pages))
+        candidates.sort(key=lambda candidate: candidate[1])  # 稳定排序, 页内保持阅读顺序
+
+        unique, seen = [], set()
+        for candidate in candidates:  # 去掉同一页中重复识别的标题, 各章都有的 本章小结、习题 等需要保留
+            if candidate[:2] not in seen:
+                seen.add(candidate[:2])
+                unique.append(candidate)
+        candidates = unique
+        self._set_outline([[title, index + 1] for title, index, _ in candidates], 0, llm,
+                          self._infer_heading_levels(candidates, fill=False),
+                          self._infer_heading_levels(candidates, fill=True))
+
+    @staticmethod
+    def _get_numbering_level(title: str) -> int | None:
+        """ 根据标题编号判断层级, 例如 第3章 为1级, 3.1 为2级, 3.1.2 为3级
+
+        Args:
+            title (str): 标题
+
+        Returns:
+            int | None: 层级, 没有可识别的编号时返回 None
+        """
+        return heading_level(title) or None
+
+    def _get_heading_candidates(self, pdf_page: fitz.Page, blocks: list[dict], body_size: float) -> list[tuple[str, float]]:
+        """ 从文字层的文本块中寻找标题: 字号明显大于正文, 或者加粗且带有标题编号的短文本块
+
+        Args:
+            pdf_page (fitz.Page): 页面
+            blocks (list[dict]): get_text('dict') 得到的文本块
+            body_size (float): 正文字号
+
+        Returns:
+            list[tuple[str, float]]: 标题和字号
+        """
+        margin = pdf_page.rect.height * self.kwargs.get('header_footer_margin', 0.06)
+        candidates = []
+        for block in blocks:
+            spans = [span for line in block['lines'] for span in line['spans'] if span['text'].strip()]
+            if not spans or len(block['lines']) > 2:
+                continue
+            title = ''.join(span['text'] for line in block['lines'] for span in line['spans']).strip()
+            if len(title) > self.kwargs.get('title_max_length', 40) or re.fullmatch(r'[\d\s.\-]+', title):
+                continue  # 过长或者只是页码
+            _, y1, _, y2 = block['bbox']
+            if y2 < pdf_page.rect.y0 + margin or y1 > pdf_page.rect.y1 - margin:
+                continue  # 页眉页脚
+            size = round(max(span['size'] for span in spans), 1)
+            bold = all(span['flags'] & fitz.TEXT_FONT_BOLD or 'bold' in span['font'].lower() for span in spans)
+            if size >= body_size * 1.15 or (bold and self._get_numbering_level(title) is not None):
+                candidates.append((title, size))
+        return candidates
+
+    def _get_heading_candidates_by_ocr(self, page_indices: list[int]) -> list[tuple[str, int, None]]:
+        """ 使用布局分析模型和 OCR 寻找没有文字层的页面中的标题
+
+        Args:
+            page_indices (list[int]): 页码列表
+
+        Returns:
+            list[tuple[str, int, None]]: 标题, 页码和字号 (未知)
+        """
+        candidates = []
+        for i in range(0, len(page_indices), self.batch_size):
+            tasks = [self._render_page(index) for index in page_indices[i:i + self.batch_size]]
+            for task, blocks in zip(tasks, self.structure_model.predict_batch([task.img for task in tasks])):
+                task.blocks = [block for block in blocks if block['type'] == 'title']
+            jobs = [(task, block) for task in tasks for block in task.blocks if block.get('text') is None]
+            crops = [self._crop_block(block, task) for task, block in jobs]
+            ocr_res = self.ocr_model.predict_batch([crop for crop in crops if crop is not None])
+            ocr_res = iter(ocr_res)
+            for (_, block), crop in zip(jobs, crops):
+                if crop is not None:
+                    block['text'], _ = next(ocr_res)
+            candidates.extend((block['text'].strip(), task.page_index, None)
+                              for task in tasks for block in task.blocks if block.get('text', '').strip())
+        return candidates
+
+    def _infer_heading_levels(self,
+                              candidates: list[tuple[str, int, float | None]],
+                              fill: bool) -> list[int | None]:
+        """ 推断标题层级: 优先使用标题编号, 其次使用字号 (根据带编号标题统计出字号和层级的对应关系),
+        最后根据相邻标题推断没有编号的标题 (前言、本章小结、参考文献等)
+
+        Args:
+            candidates (list[tuple[str, int, float | None]]): 标题, 页码和字号
+            fill (bool): 是否按字号从大到小的排名推断剩余无法确定的层级, 否则保留为 None
+
+        Returns:
+            list[int | None]: 层级, None 表示无法确定
+        """
+        numbering_levels = [self._get_numbering_level(title) for title, _, _ in candidates]
+        size2levels: dict[float, Counter] = {}
+        for (_, _, size), level in zip(candidates, numbering_levels):
+            if level is not None and size is not None:
+                size2levels.setdefault(size, Counter())[level] += 1
+        size2level = {size: counter.most_common(1)[0][0] for size, counter in size2levels.items()}
+
+        levels = [level if level is not None else size2level.get(size)
+                  for (_, _, size), level in zip(candidates, numbering_levels)]
+        known = [i for i, level in enumerate(levels) if level is not None]
+        if known:
+            top = min(levels[i] for i in known)
+            previous = None
+            for i in range(len(levels)):
+                if levels[i] is not None:
+                    previous = levels[i]
+                elif i < known[0]:  # 第一个已知标题之前, 例如 前言
+                    levels[i] = levels[known[0]]
+                elif i > known[-1]:  # 最后一个已知标题之后, 例如 参考文献、附录
+                    levels[i] = top
+                else:  # 与前一个标题同级, 例如 本章小结、习题
+                    levels[i] = previous
+        if fill:
+            sizes = sorted({size for _, _, size in candidates if size is not None}, reverse=True)
+            previous = 1
+            for i, (_, _, size) in enumerate(candidates):
+                if levels[i] is None:
+                    levels[i] = min(sizes.index(size) + 1, 3) if size is not None else previous
+                previous = levels[i]
+        return levels
 
     def get_bookmarks(self) -> list[BookMark]:
         """  获取pdf文档书签
@@ -259,6 +584,55 @@ class PDFParser(Parser):
         Args:
             bookmark (BookMark): 书签
 
+        Returns:
+            list[Content]: 内容列表
+        """
+        pages = self.get_pages(bookmark.page_start.index, bookmark.page_end.index + 1)
+        return self._slice_contents(bookmark, {page.page_index - 1: page for page in pages})
+
+    def iter_contents(self, bookmarks: list[BookMark]) -> Generator[list[Content], None, None]:
+        """ 依次获取多个书签下的所有内容, 先统计所有书签需要的页面, 相邻书签共用的边界页面只解析一次。
+        所有需要的页面在一次流式解析中依次产出, 书签的最后一页解析完成后立即产出该书签的内容
+
+        Args:
+            bookmarks (list[BookMark]): 书签列表
+
+        Returns:
+            Generator[list[Content], None, None]: 与书签一一对应的内容列表
+        """
+        # 记录每个页面最后一次被使用的书签位置, 之后不再需要的页面及时释放
+        last_use: dict[int, int] = {}
+        for idx, bookmark in enumerate(bookmarks):
+            for index in range(bookmark.page_start.index, bookmark.page_end.index + 1):
+                last_use[index] = idx
+
+        pages: dict[int, Page] = {}
+        idx = 0
+
+        def flush() -> Generator[list[Content], None, None]:
+            # 按顺序产出所需页面已经全部解析完成的书签
+            nonlocal idx
+            while idx < len(bookmarks) and all(
+                    index in pages for index in range(bookmarks[idx].page_start.index, bookmarks[idx].page_end.index + 1)):
+                bookmark = bookmarks[idx]
+                yield self._slice_contents(bookmark, pages)
+                for index in range(bookmark.page_start.index, bookmark.page_end.index + 1):
+                    if last_use.get(index) == idx:
+                        pages.pop(index, None)
+                idx += 1
+
+        yield from flush()
+        for page in self._iter_pages(sorted(last_use)):
+            pages[page.page_index - 1] = page
+            yield from flush()
+
+    def _slice_contents(self, bookmark: BookMark, pages: dict[int, Page]) -> list[Content]:
+        """ 从已解析的页面中截取书签对应的内容, 使用标题或锚点定位首尾页面中的起止位置
+
+        Args:
+            bookmark (BookMark): 书签
+            pages (dict[int, Page]): 页码 (从0开始) 到页面的映射, 需要包含书签范围内的所有页面
+
         Returns:
             list[Content]: 内容列表
         """
@@ -268,10 +642,9 @@ class PDFParser(Parser):
 
         # 获取书签对应的页面内容
         contents: list[Content] = []
-        # 后续这个地方可以并行执行
         for index in range(bookmark.page_start.index, bookmark.page_end.index + 1):
 
-            page_contents = self.get_page(index).contents
+            page_contents = pages[index].contents
 
             if index == bookmark.page_start.index:
                 idx = 0
@@ -308,28 +681,63 @@ class PDFParser(Parser):
             contents.extend(page_contents)
         return contents
 
-    def _get_page_img(self, page_index: int, zoom: int = 1) -> ndarray:
+    def _get_page_img(self, page_index: int, zoom: float = 1) -> ndarray:
         """ 获取页面的图像对象
 
         Args:
             page_index (int): 页码
-            zoom (int, optional): 缩放倍数. Defaults to 1.
+            zoom (float, optional): 缩放倍数. Defaults to 1.
 
         Returns:
             _type_: opencv 转换后的图像对象
         """
-        pdf_page = self._pdf[page_index]
-        mat = fitz.Matrix(zoom, zoom)
-        pm = pdf_page.get_pixmap(matrix=mat, alpha=False)
-        # 图片过大则放弃缩放
-        if pm.width > 2000 or pm.height > 2000:
-            pm = pdf_page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
-        img = Image.frombytes("RGB", (pm.width, pm.height), pm.samples)
+        with self._fitz_lock:
+            pdf_page = self._pdf[page_index]
+            mat = fitz.Matrix(zoom, zoom)
+            pm = pdf_page.get_pixmap(matrix=mat, alpha=False)
+            # 图片过大则放弃缩放
+            if pm.width > 2000 or pm.height > 2000:
+                pm = pdf_page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
+            img = Image.frombytes("RGB", (pm.width, pm.height), pm.samples)  # 复制像素数据后释放 pixmap
+            del pm
         img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
         return img
 
+    def _get_cache_key(self, page_index: int) -> str:
+        """ 获取页面的缓存键, 包含文档内容哈希、页码和所有影响解析结果的参数
+
+        Args:
+            page_index (int): 页码
+
+        Returns:
+            str: 缓存键
+        """
+        if self._file_hash is None:
+            sha256 = hashlib.sha256()
+            with open(self.file_path, 'rb') as f:
+                while chunk := f.read(1 << 20):
+                    sha256.update(chunk)
+            self._file_hash = sha256.hexdigest()
+        settings = {
+            'zoom': self.kwargs.get('zoom', 2),
+            'wt': self.kwargs.get('wt', 20),
+            'ht': self.kwargs.get('ht', 5),
+            'cropped_border_size': self.kwargs.get('cropped_border_size', 20),
+            'sharpen': self.sharpen,
+            'ocr_priority': self.ocr_priority,
+            'ocr_confidence': self.kwargs.get('ocr_confidence', 0.95),
+            'fast': self.fast,
+            'title_max_length': self.kwargs.get('title_max_length', 40),
+            'header_footer_margin': self.kwargs.get('header_footer_margin', 0.06),
+            'min_text_coverage': self.kwargs.get('min_text_coverage', 0.05),
+            'font_sample_pages': self.kwargs.get('font_sample_pages', 20),
+            'correction_length': self.kwargs.get('correction_length', 2000),
+            **self._identities
+        }
+        return PageCache.get_key(self._file_hash, page_index, settings)
+
     def get_page(self, page_index: int) -> Page:
-        """ 获取文档页面
+        """ 获取文档页面, 设置了 page_cache 时优先读取缓存
 
         Args:
             page_index (int): 页码, 从0开始计数
@@ -337,17 +745,164 @@ class PDFParser(Parser):
         Returns:
             Page: 文档页面
         """
-        zoom = self.kwargs.get('zoom', 2)
-        pdf_page = self._pdf[page_index]
+        if self.page_cache is None:
+            return self._parse_page(page_index)
+        key = self._get_cache_key(page_index)
+        if (page := self.page_cache.get(key)) is None:
+            page = self._parse_page(page_index)
+            self.page_cache.set(key, page)
+        return page
+
+    def _parse_page(self, page_index: int) -> Page:
+        """ 解析文档页面
+
+        Args:
+            page_index (int): 页码, 从0开始计数
+
+        Returns:
+            Page: 文档页面
+        """
+        return self._parse_pages([page_index])[0]
+
+    def _get_body_font_size(self) -> float:
+        """ 获取正文字号, 在均匀抽样的页面中按字符数统计出现最多的字号
+
+        Returns:
+            float: 正文字号
+        """
+        with self._fitz_lock:
+            if self._body_font_size is None:
+                step = max(1, self._pdf.page_count // self.kwargs.get('font_sample_pages', 20))
+                counter = Counter()
+                for page_index in range(0, self._pdf.page_count, step):
+                    for block in self._pdf[page_index].get_text('dict', flags=fitz.TEXTFLAGS_TEXT)['blocks']:
+                        for line in block['lines']:
+                            for span in line['spans']:
+                                counter[round(span['size'], 1)] += len(span['text'].strip())
+                self._body_font_size = counter.most_common(1)[0][0] if counter else 0.
+        return self._body_font_size
+
+    def _is_born_digital(self, pdf_page: fitz.Page, text_blocks: list[dict]) -> bool:
+        """ 判断页面的文字层是否可信: 字体均已嵌入、没有无法解码的字符、文字覆盖率足够, 且没有需要识别的大面积图像
+
+        Args:
+            pdf_page (fitz.Page): 页面
+            text_blocks (list[dict]): get_text('dict') 得到的文本块
+
+        Returns:
+            bool: 是否可以直接使用文字层
+        """
+        if any(font[1] == 'n/a' for font in pdf_page.get_fonts()):  # 存在未嵌入的字体
+            return False
+        text = ''.join(span['text'] for block in text_blocks for line in block['lines'] for span in line['spans'])
+        if len(text.strip()) == 0 or '\ufffd' in text:
+            return False
+        page_area = abs(pdf_page.rect)
+        text_area = sum(abs(fitz.Rect(block['bbox']) & pdf_page.rect) for block in text_blocks)
+        if text_area / page_area < self.kwargs.get('min_text_coverage', 0.05):
+            return False
+        for image in pdf_page.get_image_info():
+            image_area = abs(fitz.Rect(image['bbox']) & pdf_page.rect) / page_area
+            if image_area > 0.8:  # 整页图像上叠加的文字层 (扫描件 OCR 后的文字层), 不可信
+                return False
+            if self.vlm is not None and image_area > 0.05:  # 图片需要交给视觉模型识别
+                return False
+        return True
+
+    def _parse_text_layer(self, page_index: int) -> Page | None:
+        """ 不渲染页面, 直接根据文字层的文本块和字号、字重生成页面内容, 文字层不可信时返回 None
+
+        Args:
+            page_index (int): 页码, 从0开始计数
+
+        Returns:
+            Page | None: 文档页面
+        """
+        with self._fitz_lock:
+            pdf_page = self._pdf[page_index]
+            text_blocks = [block for block in pdf_page.get_text('dict', flags=fitz.TEXTFLAGS_TEXT, sort=True)['blocks']
+                           if block['type'] == 0]
+            if not self._is_born_digital(pdf_page, text_blocks):
+                return None
+
+            body_size = self._get_body_font_size()
+            margin = pdf_page.rect.height * self.kwargs.get('header_footer_margin', 0.06)
+            contents: list[Content] = []
+            for block in text_blocks:
+                spans = [span for line in block['lines'] for span in line['spans'] if span['text'].strip()]
+                if not spans:
+                    continue
+                content = ''.join(span['text'] for line in block['lines'] for span in line['spans']).strip()
+                x1, y1, x2, y2 = block['bbox']
+                if (y2 < pdf_page.rect.y0 + margin or y1 > pdf_page.rect.y1 - margin) and len(content) <= 40:
+                    continue  # 页眉页脚
+                size = max(span['size'] for span in spans)
+                bold = all(span['flags'] & fitz.TEXT_FONT_BOLD or 'bold' in span['font'].lower() for span in spans)
+                is_title = (len(block['lines']) <= 2 and len(content) <= self.kwargs.get('title_max_length', 40)
+                            and (size >= body_size * 1.15 or (bold and size >= body_size)))
+                contents.append(Content(
+                    type=ContentType.Title if is_title else ContentType.Text,
+                    content=content,
+                    bbox=(x1, y1, x2, y2),
+                    origin_type='title' if is_title else 'text'))
+            return Page(page_index=page_index + 1, contents=contents)
+
+    def _parse_pages(self, page_indices: list[int]) -> list[Page]:
+        """ 分阶段解析一批文档页面: 渲染、布局分析、读取文字、视觉模型识别, 同一批页面的布局分析和 OCR 分别合并为一次批量推理
+
+        Args:
+            page_indices (list[int]): 页码列表, 从0开始计数
+
+        Returns:
+            list[Page]: 文档页面
+        """
+        items = [(self.fast and self._parse_text_layer(index)) or self._render_page(index) for index in page_indices]
+        tasks = [item for item in items if isinstance(item, _PageTask)]
+        if tasks:
+            for task, blocks in zip(tasks, self.structure_model.predict_batch([task.img for task in tasks])):
+                task.blocks = blocks
+            self._set_texts(tasks)
+            if self.vlm is not None:
+                self._set_texts_by_vlm(tasks)
+        return [self._to_page(item) if isinstance(item, _PageTask) else item for item in items]
+
+    def _render_page(self, page_index: int) -> '_PageTask':
+        """ 以布局分析模型的输入分辨率渲染页面, 需要识别的区块之后再按区域以高分辨率单独渲染
+
+        Args:
+            page_index (int): 页码, 从0开始计数
+
+        Returns:
+            _PageTask: 页面解析任务
+        """
+        input_size = self.structure_model.input_size
+        with self._fitz_lock:
+            rect = self._pdf[page_index].rect
+        if input_size is not None:  # 模型内部会缩放到该尺寸, 更高的分辨率没有意义
+            zoom = input_size / max(rect.width, rect.height)
+        else:
+            zoom = self.kwargs.get('zoom', 2)
         img = self._get_page_img(page_index, zoom=zoom)
+        zoom = img.shape[1] / rect.width  # 图片过大时会放弃缩放, 以实际渲染的尺寸为准
+        return _PageTask(page_index=page_index, zoom=zoom, img=img)
+
+    def _enhance(self, img: ndarray, sharpen: bool = True) -> ndarray:
+        """ 对区块图像进行增强和锐化处理
+
+        Args:
+            img (ndarray): 区块图像
+            sharpen (bool, optional): 是否转为灰度图并锐化, 文本区块使用. Defaults to True.
 
+        Returns:
+            ndarray: 处理后的图像
+        """
         if self.enhance_fn is not None: # 自定义增强函数
             img = self.enhance_fn(img)
-        
+        if not sharpen:
+            return img
+
         img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        h, w, _ = img.shape
-        
         match self.sharpen:
             case 'USM':  # 非锐化掩膜
                 strength = 1
@@ -358,96 +913,389 @@ class PDFParser(Parser):
             case _:
                 pass
 
-        # 处理后转回 BGR 格式 (只是为了OCR模型和布局分析模型能够正常使用, 但颜色信息已经丢失了)
-        img_sharpen = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
-        
-        # 文本区域 (text/title) 和布局检测使用 img_sharpen 对象
-        # 非文本区域使用 img 对象
-        blocks = self.structure_model(img_sharpen)
-
-        def save_block(block_: StructureResult, img_: ndarray, idx: int) -> None | str:
-            wt, ht = self.kwargs.get('wt', 20), self.kwargs.get('ht', 5)  # 切割子图, 向左右扩充wt, 向上扩充ht
-            x1, y1, x2, y2 = block_['bbox']
-            type_ = block_['type']
+        # 处理后转回 BGR 格式 (只是为了OCR模型能够正常使用, 但颜色信息已经丢失了)
+        return cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
+
+    def _crop_block(self, block: StructureResult, task: '_PageTask', sharpen: bool = True) -> None | ndarray:
+        """ 以高分辨率单独渲染区块所在区域, 增强处理后添加白色边框, 直接在内存中传递给模型
+
+        Args:
+            block (StructureResult): 区块
+            task (_PageTask): 页面解析任务
+            sharpen (bool, optional): 是否转为灰度图并锐化, 文本区块使用. Defaults to True.
+
+        Returns:
+            None | ndarray: 区块图像, 区域过小时返回 None
+        """
+        zoom = self.kwargs.get('zoom', 2)
+        wt, ht = self.kwargs.get('wt', 20), self.kwargs.get('ht', 5)  # 切割子图, 向左右扩充wt, 向上扩充ht (高分辨率图像中的像素)
+        x1, y1, x2, y2 = (b / task.zoom for b in block['bbox'])
+        with self._fitz_lock:
+            pdf_page = self._pdf[task.page_index]
             # 扩充裁剪区域
-            x1, y1, x2, y2 = max(0.0, x1 - wt), max(0.0, y1 - ht), min(float(w), x2 + wt), min(float(h), y2 + ht)  # 防止越界
-            if (x2 - x1) < 5 or (y2 - y1) < 5:
+            clip = fitz.Rect(x1 - wt / zoom, y1 - ht / zoom, x2 + wt / zoom, y2 + ht / zoom) & pdf_page.rect  # 防止越界
+            w, h = clip.width * zoom, clip.height * zoom
+            if w < 5 or h < 5:
                 return  # 区域过小
-            if type_ == 'figure' and ((x2 - x1) < 150 or (y2 - y1) < 150):
+            if block['type'] == 'figure' and (w < 150 or h < 150):
                 return  # 图片过小
-            # 裁剪图像
-            cropped_img = Image.fromarray(img_).crop((x1, y1, x2, y2))
-            border_size = self.kwargs.get('cropped_border_size', 20)
-            new_size = (cropped_img.width + 2*border_size, cropped_img.height + 2*border_size)
-            bordered_img = Image.new('RGB', new_size, 'white')
-            bordered_img.paste(cropped_img, (border_size, border_size))
-            
-            path = os.path.join(self.cache_path, f'{idx}_{str(shortuuid.uuid())}_{type_}.png')
-            bordered_img.save(path)
-            return path
-
-        def set_text_auto(block_: StructureResult, idx: int) -> None:
-            bbox = [b / zoom for b in block_['bbox']]
-
-            if block_.get('text', None) is not None:  # 已经设置过 text 属性
-                pass
-            else:
-                res = pdf_page.get_textbox(bbox).replace('\n', '')  # 直接读取
+            pm = pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+            img = np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, pm.n).copy()  # 复制像素数据后释放 pixmap
+            del pm
+        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        img = self._enhance(img, sharpen)
+        border_size = self.kwargs.get('cropped_border_size', 20)
+        return cv2.copyMakeBorder(img, border_size, border_size, border_size, border_size,
+                                  cv2.BORDER_CONSTANT, value=(255, 255, 255))
+
+    def _set_texts(self, tasks: list['_PageTask']) -> None:
+        """ 为文本区块 (text/title) 设置文字, 优先直接读取, 无法读取的区块使用布局分析模型已经识别出的文字, 其余收集起来批量 OCR
+
+        Args:
+            tasks (list[_PageTask]): 页面解析任务
+        """
+        ocr_blocks: list[StructureResult] = []
+        crops: list[ndarray] = []
+        uncertain: list[StructureResult] = []
+        min_confidence = self.kwargs.get('ocr_confidence', 0.95)
+        for task in tasks:
+            for block in task.blocks:
+                if block['type'] not in ['title', 'text']:
+                    continue
+                recognized = block.pop('text', None)  # 布局分析模型 (如 PaddleStructure(ocr=True)) 识别出的文字
+                bbox = [b / task.zoom for b in block['bbox']]
+                with self._fitz_lock:
+                    res = self._pdf[task.page_index].get_textbox(bbox).replace('\n', '')  # 直接读取
                 if len(res) != 0 and not bool(re.search(r'[\uFFFD]', res)) and not self.ocr_priority:
-                    block_['text'] = res
-                elif path := save_block(block_, img_sharpen, idx):  # OCR
-                    res = self.ocr_model(path)
-                    if self.llm is not None:
-                        try:
-                            prompt_, instruction_ = self.parser_prompt.get_ocr_aided_prompt(res)
-                            self.llm.instruction = instruction_
-                            res, _ = self.llm.chat(prompt_)
-                        finally:
-                            pass  # 使用大模型矫正这一步不是必须的
-                    block_['text'] = res
-        
-        def set_text_by_vlm(block_: StructureResult, idx: int) -> None:
-            if file_path := save_block(block_, img, idx):
-                prompt, instruction = self.vl_prompt.get_ocr_prompt()
-                self.vlm.instruction = instruction
-                block_['text'], _ = self.vlm.image_chat(path=file_path, message=prompt)
-
-        for idx, block in enumerate(blocks):
-            type_ = block['type']
-            if type_ in ['abandon']:
-                continue
-            elif type_ in ['title', 'text']:
-                set_text_auto(block, idx)  # 直接读取 或 OCR
-            else:
-                if self.vlm is not None:
-                    set_text_by_vlm(block, idx)  # 使用多模态模型
+                    block['text'] = res
+                elif recognized is not None:  # 不再重复 OCR
+                    block['text'] = recognized
+                    if recognized and block.get('confidence', 0.) < min_confidence:
+                        uncertain.append(block)
+                elif (cropped := self._crop_block(block, task)) is not None:  # OCR
+                    ocr_blocks.append(block)
+                    crops.append(cropped)
 
-        contents: list[Content] = []
+        if crops:
+            for block, (res, confidence) in zip(ocr_blocks, self.ocr_model.predict_batch(crops)):
+                block['text'] = res
+                # 置信度足够高的区块不需要矫正, 不提供置信度的模型 (confidence 为 None) 全部矫正
+                if res and (confidence is None or confidence < min_confidence):
+                    uncertain.append(block)
+        if self.llm is not None and uncertain:
+            self._correct_texts(uncertain)
+
+    def _correct_texts(self, blocks: list[StructureResult]) -> None:
+        """ 使用大模型批量矫正 OCR 结果, 同一批页面的区块按编号组织在一次请求中, 过长时按 correction_length 分为多次请求
+
+        Args:
+            blocks (list[StructureResult]): 需要矫正的区块
+        """
+        max_length = self.kwargs.get('correction_length', 2000)
+        chunks: list[list[StructureResult]] = [[]]
+        length = 0
         for block in blocks:
+            if chunks[-1] and length + len(block['text']) > max_length:
+                chunks.append([])
+                length = 0
+            chunks[-1].append(block)
+            length += len(block['text'])
+
+        for chunk in chunks:
+            texts = {str(i): block['text'] for i, block in enumerate(chunk)}
+            try:
+                prompt_, instruction_ = self.parser_prompt.get_ocr_aided_batch_prompt(texts)
+                self.llm.instruction = instruction_
+                res, _ = self.llm.chat(prompt_)
+                corrected = json.loads(res[res.index('{'):res.rindex('}') + 1])
+                for i, block in enumerate(chunk):
+                    if isinstance(text := corrected.get(str(i)), str) and text:
+                        block['text'] = text
+            except Exception as e:
+                logger.warning(f'OCR 结果矫正失败, 保留原始识别结果: {e}')  # 使用大模型矫正这一步不是必须的
+
+    def _set_texts_by_vlm(self, tasks: list['_PageTask']) -> None:
+        """ 使用多模态模型为非文本区块设置文字, 最多同时发起 vlm_concurrency 个请求, 单个区块识别失败不影响其它区块
+
+        Args:
+            tasks (list[_PageTask]): 页面解析任务
+        """
+        jobs: list[tuple[int, StructureResult, ndarray]] = []
+        for task in tasks:
+            for block in task.blocks:
+                if block['type'] in ['abandon', 'title', 'text']:
+                    continue
+                if (cropped := self._crop_block(block, task, sharpen=False)) is not None:
+                    jobs.append((task.page_index, block, cropped))
+        if not jobs:
+            return
+
+        prompt, instruction = self.vl_prompt.get_ocr_prompt()
+        self.vlm.instruction = instruction
+
+        def recognize(cropped: ndarray) -> str:
+            res, _ = self.vlm.image_chat(path=cropped, message=prompt)
+            return res
+
+        with ThreadPoolExecutor(max_workers=self.vlm_concurrency) as executor:
+            futures = [executor.submit(recognize, cropped) for _, _, cropped in jobs]
+            for (page_index, block, _), future in zip(jobs, futures):  # 按阅读顺序写回
+                try:
+                    block['text'] = future.result()
+                except Exception as e:
+                    logger.warning(f'第 {page_index + 1} 页 {block["type"]} 区块识别失败: {e}')
+
+    @staticmethod
+    def _to_page(task: '_PageTask') -> Page:
+        """ 将解析完成的区块组织为页面
+
+        Args:
+            task (_PageTask): 页面解析任务
+
+        Returns:
+            Page: 文档页面
+        """
+        contents: list[Content] = []
+        for block in task.blocks:
             if content := block.get('text', None):  # 空字符串或None
                 content = Content(
                     type=ContentType.Text,
                     content=content,
-                    bbox=tuple([b / zoom for b in block['bbox']]),  # 还原为原始大小坐标
+                    bbox=tuple([b / task.zoom for b in block['bbox']]),  # 还原为原始大小坐标
                     origin_type=block['origin_type'])
                 if block['type'] == 'title':
                     content.type = ContentType.Title  # 除了title其余全部当作正文对待
                 contents.append(content)
-        
-        for root, dirs, files in os.walk(self.cache_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                os.remove(file_path)
 
-        return Page(page_index=page_index + 1, contents=contents)
+        return Page(page_index=task.page_index + 1, contents=contents)
+
+    def get_pages(self, start: int = 0, end: int = None) -> list[Page]:
+        """ 获取pdf文档页面
 
-    def get_pages(self) -> list[Page]:
-        """ 获取pdf文档所有页面
+        Args:
+            start (int, optional): 起始页码, 从0开始计数. Defaults to 0.
+            end (int, optional): 终止页码 (不包含终止页). Defaults to None 即文档末尾.
 
         Returns:
-            list[Page]: 页面列表
+            list[Page]: 按页码排序的页面列表
         """
-        pages: list[Page] = []
-        for index in range(0, self._pdf.page_count):
-            pages.append(self.get_page(page_index=index))
+        return list(self.iter_pages(start, end))
+
+    def iter_pages(self, start: int = 0, end: int = None, prefetch: int = 2) -> Generator[Page, None, None]:
+        """ 流式获取pdf文档页面, 每 batch_size 个页面作为一批进行解析, 按页码顺序产出解析完成的页面。
+
+        单进程时渲染、布局分析和文字识别三个阶段分别在不同线程中重叠执行, 阶段之间通过有界队列传递;
+        workers 大于 1 时多批页面使用多进程并行解析。内存中最多保留 prefetch 批尚未产出的页面。
+
+        Args:
+            start (int, optional): 起始页码, 从0开始计数. Defaults to 0.
+            end (int, optional): 终止页码 (不包含终止页). Defaults to None 即文档末尾.
+            prefetch (int, optional): 预取的批数. Defaults to 2.
+
+        Returns:
+            Generator[Page, None, None]: 页面
+        """
+        if end is None:
+            end = self._pdf.page_count
+        yield from self._iter_pages(list(range(start, end)), prefetch)
+
+    def _iter_pages(self, page_indices: list[int], prefetch: int = 2) -> Generator[Page, None, None]:
+        """ 流式解析任意页码列表, 页码不必连续
+
+        Args:
+            page_indices (list[int]): 页码列表, 从0开始计数
+            prefetch (int, optional): 预取的批数. Defaults to 2.
+
+        Returns:
+            Generator[Page, None, None]: 按 page_indices 的顺序产出页面
+        """
+        batches = [page_indices[i:i + self.batch_size] for i in range(0, len(page_indices), self.batch_size)]
+        if self.workers > 1 and len(batches) > 1:
+            stream = self._iter_batches_in_pool(batches, prefetch)
+        else:
+            stream = self._iter_batches_in_pipeline(batches, prefetch)
+        for pages in stream:
+            yield from pages
+
+    def _load_cached_pages(self, page_indices: list[int]) -> dict[int, Page]:
+        """ 读取缓存中已有的页面
+
+        Args:
+            page_indices (list[int]): 页码列表
+
+        Returns:
+            dict[int, Page]: 命中的页面
+        """
+        pages: dict[int, Page] = {}
+        if self.page_cache is not None:
+            for index in page_indices:
+                if (page := self.page_cache.get(self._get_cache_key(index))) is not None:
+                    pages[index] = page
         return pages
+
+    def _save_cached_pages(self, pages: list[Page]) -> None:
+        """ 缓存解析完成的页面
+
+        Args:
+            pages (list[Page]): 页面列表
+        """
+        if self.page_cache is not None:
+            for page in pages:
+                self.page_cache.set(self._get_cache_key(page.page_index - 1), page)
+
+    def _iter_batches_in_pool(self,
+                              batches: list[list[int]],
+                              prefetch: int) -> Generator[list[Page], None, None]:
+        """ 使用进程池解析多批页面, 缓存在主进程中读写, 只把未命中的页面分发给工作进程
+
+        Args:
+            batches (list[list[int]]): 各批页码
+            prefetch (int): 除工作进程正在处理的批次外, 额外提交的批数
+
+        Returns:
+            Generator[list[Page], None, None]: 按顺序产出每批页面
+        """
+        executor = self._get_executor()
+        pending = deque()
+
+        def submit(batch: list[int]) -> None:
+            cached = self._load_cached_pages(batch)
+            missing = [index for index in batch if index not in cached]
+            future = executor.submit(_get_pages_in_worker, missing) if missing else None
+            pending.append((batch, cached, future))
+
+        remaining = iter(batches)
+        try:
+            for batch in islice(remaining, self.workers + prefetch):
+                submit(batch)
+            while pending:
+                batch, pages, future = pending.popleft()
+                if future is not None:
+                    parsed = future.result()
+                    self._save_cached_pages(parsed)
+                    pages.update({page.page_index - 1: page for page in parsed})
+                if (batch_ := next(remaining, None)) is not None:
+                    submit(batch_)
+                yield [pages[index] for index in batch]
+        except BrokenProcessPool as e:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None  # 损坏的进程池不能继续使用, 下次解析时重新创建
+            raise RuntimeError(
+                '解析页面的工作进程异常退出。workers > 1 时工作进程以 spawn 方式启动并重新导入主模块, '
+                "请将解析代码放在 if __name__ == '__main__': 下; 否则请检查工作进程中模型加载是否失败 (如内存不足)"
+            ) from e
+
+    def _iter_batches_in_pipeline(self,
+                                  batches: list[list[int]],
+                                  prefetch: int) -> Generator[list[Page], None, None]:
+        """ 流水线解析多批页面: 渲染线程 -> 布局分析线程 -> 当前线程读取文字、OCR 和视觉模型识别
+
+        Args:
+            batches (list[list[int]]): 各批页码
+            prefetch (int): 阶段之间队列的容量 (批数)
+
+        Returns:
+            Generator[list[Page], None, None]: 按顺序产出每批页面
+        """
+        rendered = queue.Queue(maxsize=prefetch)
+        analyzed = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        end_ = object()  # 结束标记
+
+        def put(q: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def get(q: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return end_
+
+        def render() -> None:
+            try:
+                # 渲染与当前线程读取文字共用同一个文档句柄, 由 _fitz_lock 保证 fitz 调用不会重叠
+                for batch in batches:
+                    cached = self._load_cached_pages(batch)
+                    items = [cached.get(index) or (self.fast and self._parse_text_layer(index))
+                             or self._render_page(index) for index in batch]
+                    if not put(rendered, (items, set(cached))):
+                        return
+            except Exception as e:
+                put(rendered, e)
+            else:
+                put(rendered, end_)
+
+        def analyze() -> None:
+            while True:
+                batch = get(rendered)
+                if batch is end_ or isinstance(batch, Exception):
+                    put(analyzed, batch)
+                    return
+                try:
+                    tasks = [item for item in batch[0] if isinstance(item, _PageTask)]
+                    if tasks:
+                        for task, blocks in zip(tasks, self.structure_model.predict_batch([task.img for task in tasks])):
+                            task.blocks = blocks
+                except Exception as e:
+                    put(analyzed, e)
+                    return
+                if not put(analyzed, batch):
+                    return
+
+        threads = [threading.Thread(target=render, daemon=True), threading.Thread(target=analyze, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            while (batch := get(analyzed)) is not end_:
+                if isinstance(batch, Exception):
+                    raise batch
+                items, cached = batch
+                tasks = [item for item in items if isinstance(item, _PageTask)]
+                if tasks:
+                    self._set_texts(tasks)
+                    if self.vlm is not None:
+                        self._set_texts_by_vlm(tasks)
+                pages = [self._to_page(item) if isinstance(item, _PageTask) else item for item in items]
+                # 与进程池模式一致, 快速模式直接生成的页面也写入缓存
+                self._save_cached_pages([page for page in pages if page.page_index - 1 not in cached])
+                yield pages
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+
+@dataclass
+class _PageTask:
+    """ 页面解析过程中的中间状态
+    """
+    page_index: int
+    zoom: float  # 渲染图像相对于原始页面的缩放倍数
+    img: ndarray  # 以布局分析模型输入分辨率渲染的页面图像
+    blocks: list[StructureResult] = field(default_factory=list)
+
+
+_worker_parser: PDFParser | None = None  # 工作进程持有的解析器
+
+
+def _init_worker(pdf_path: str, kwargs: dict) -> None:
+    """ 工作进程初始化, 每个进程打开独立的文档句柄并加载各自的模型
+
+    Args:
+        pdf_path (str): pdf文档路径
+        kwargs (dict): 解析器参数
+    """
+    global _worker_parser
+    _worker_parser = PDFParser(pdf_path, **kwargs)
+
+
+def _get_pages_in_worker(page_indices: list[int]) -> list[Page]:
+    return _worker_parser._parse_pages(page_indices)
@@ -6,12 +6,12 @@
 
 from abc import ABC, abstractmethod
 from typing_extensions import Required, TypedDict, Literal
+import ast
+import cv2
+import numpy as np
 from numpy import ndarray
-from paddleocr.ppstructure.recovery.recovery_to_doc import sorted_layout_boxes
-from paddleocr import PPStructure
-from doclayout_yolo import YOLOv10
-import json
-from course_graph._core import structure
+from course_graph._core import suppress_batch
+from ..utils import ReconstructMixin
 
 
 class StructureResult(TypedDict, total=False):
@@ -21,9 +21,12 @@ class StructureResult(TypedDict, total=False):
     type: Required[str]
     bbox: Required[tuple[float, float, float, float]]
     text: str
+    confidence: float  # 布局分析模型同时识别出的文字的置信度
 
 
-class StructureModel(ABC):
+class StructureModel(ReconstructMixin, ABC):
+
+    input_size: int | None = None  # 模型输入图像的长边尺寸, 页面会直接按该尺寸渲染; None 表示使用解析器的缩放倍数
 
     @abstractmethod
     def predict(self, img: ndarray) -> list[StructureResult]:
@@ -31,17 +34,29 @@ class StructureModel(ABC):
         """
         raise NotImplementedError
 
+    def predict_batch(self, imgs: list[ndarray]) -> list[list[StructureResult]]:
+        """ 批量生成布局分析结果, 默认逐张分析, 支持批量推理的模型应重写该方法
+        """
+        return [self.predict(img) for img in imgs]
+
     def __call__(self, img: ndarray) -> list[StructureResult]:
         return self.predict(img)
 
 
 class PaddleStructure(StructureModel):
 
-    def __init__(self) -> None:
+    def __init__(self, ocr: bool = False) -> None:
         """ 飞桨布局分析模型 ref: https://github.com/PaddlePaddle/PaddleOCR/
+
+        Args:
+            ocr (bool, optional): 是否同时识别文本区块 (text/title) 的文字并保存在 text 属性中, 解析器需要 OCR 时直接使用, 不再重复识别;
+                否则只进行布局分析, 适用于文字主要从 pdf 文字层读取的文档. Defaults to False.
         """
         super().__init__()
-        self.pp = PPStructure(table=False, ocr=True, show_log=False)
+        from paddleocr import PPStructure  # 推理后端均延迟到构造模型时导入
+        self.ocr = ocr
+        self.input_size = None if ocr else 800  # 需要识别文字时按解析器的缩放倍数渲染, 保证文字清晰
+        self.pp = PPStructure(table=False, ocr=ocr, show_log=False)
         self.origin2type = {
             'header': 'abandon',
             'footer': 'abandon',
@@ -51,15 +66,24 @@ class PaddleStructure(StructureModel):
 
     def predict(self, img: ndarray) -> list[StructureResult]:
         # labels: text, title, figure, figure_caption, table, table_caption, header, footer, reference, equation
+        from paddleocr.ppstructure.recovery.recovery_to_doc import sorted_layout_boxes
+
         result = self.pp(img)
         h, w, _ = img.shape
         res = sorted_layout_boxes(result, w)
 
-        return [{
-            'origin_type': item['type'],
-            'bbox': tuple(item['bbox']),
-            'type': self.origin2type.get(item['type'], item['type'])
-        } for item in res]
+        blocks: list[StructureResult] = []
+        for item in res:
+            block: StructureResult = {
+                'origin_type': item['type'],
+                'bbox': tuple(item['bbox']),
+                'type': self.origin2type.get(item['type'], item['type'])
+            }
+            if self.ocr and block['type'] in ['title', 'text'] and isinstance(item.get('res'), list):
+                block['text'] = ''.join(line['text'] for line in item['res'])  # 保留识别出的文字
+                block['confidence'] = min((line.get('confidence', 0.) for line in item['res']), default=0.)
+            blocks.append(block)
+        return blocks
 
 
 class LayoutYOLO(StructureModel):
@@ -73,7 +97,9 @@ class LayoutYOLO(StructureModel):
             conf (float, optional): 置信度阈值. Defaults to 0.2.
         """
         super().__init__()
+        from doclayout_yolo import YOLOv10
         self.model = YOLOv10(model_path)
+        self.input_size = 1024
         self.device = device
         self.origin2type = {
             'plain text': 'text',
@@ -82,26 +108,183 @@ class LayoutYOLO(StructureModel):
         self.conf = conf
 
     def predict(self, img: ndarray) -> list[StructureResult]:
-        result = json.loads(
-            self.model.predict(img,
-                               imgsz=1024,
-                               conf=self.conf,
-                               verbose=False,
-                               device=self.device)[0].tojson())
-        # 将 bbox 坐标变换为 (x1,y1,x2,y2) 格式
-        for item in result:
-            item['bbox'] = (item['box']['x1'], item['box']['y1'],
-                            item['box']['x2'], item['box']['y2'])
-        _, w, _ = img.shape
-        res = sorted_layout_boxes(result, w)
+        return self.predict_batch([img])[0]
+
+    def predict_batch(self, imgs: list[ndarray]) -> list[list[StructureResult]]:
+        # 多张页面在一次前向推理中完成
+        results = self.model.predict(list(imgs),
+                                     imgsz=self.input_size,
+                                     conf=self.conf,
+                                     verbose=False,
+                                     device=self.device)
+        return _to_structure_results([self._post_process(result) for result in results], imgs, self.origin2type)
+
+    @staticmethod
+    def _post_process(result) -> tuple[ndarray, ndarray, list[str]]:
+        # 直接从结果张量中读取 (x1,y1,x2,y2) 格式的 bbox、类别和置信度
+        boxes = result.boxes.xyxy.cpu().numpy()
+        classes = result.boxes.cls.cpu().numpy().astype(int)
+        scores = result.boxes.conf.cpu().numpy()
+        return boxes, scores, [result.names[cls] for cls in classes]
+
+
+class LayoutYOLOOnnx(StructureModel):
+
+    def __init__(self,
+                 model_path: str,
+                 conf: float = 0.2,
+                 threads: int = 0,
+                 names: dict[int, str] = None) -> None:
+        """ 使用 ONNX Runtime 在 CPU 上运行的 DocLayout-YOLO 布局分析模型, 模型可以通过 LayoutYOLOOnnx.export 导出
+
+        Args:
+            model_path (str): onnx 模型路径
+            conf (float, optional): 置信度阈值. Defaults to 0.2.
+            threads (int, optional): 单个算子内部使用的线程数, 0 表示由 ONNX Runtime 决定. Defaults to 0.
+            names (dict[int, str], optional): 类别名称, 默认从模型元数据中读取. Defaults to None.
+        """
+        super().__init__()
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        if names is None:  # ultralytics 导出时将类别名称写入元数据
+            names = ast.literal_eval(self.session.get_modelmeta().custom_metadata_map['names'])
+        self.names = names
+        self.input_size = 1024
+        self.origin2type = {
+            'plain text': 'text',
+            'isolate_formula': 'formula'
+        }
+        self.conf = conf
+
+    @staticmethod
+    def export(model_path: str,
+               imgsz: int = 1024,
+               quantize: bool = False,
+               calibration_imgs: list[ndarray] = None) -> str:
+        """ 将 DocLayout-YOLO 模型导出为 onnx 格式, 可选进行 int8 量化。
+        提供校准图像时进行 QDQ 格式的静态量化, 否则对权重进行 uint8 动态量化 (ONNX Runtime 的 CPU 后端没有 int8 权重的 ConvInteger 实现)
+
+        Args:
+            model_path (str): 模型路径, onnx 模型导出到同一目录
+            imgsz (int, optional): 输入尺寸. Defaults to 1024.
+            quantize (bool, optional): 是否进行 int8 量化. Defaults to False.
+            calibration_imgs (list[ndarray], optional): 静态量化使用的校准页面图像 (BGR). Defaults to None 即动态量化.
+
+        Returns:
+            str: onnx 模型路径
+        """
+        from doclayout_yolo import YOLOv10
+        onnx_path = YOLOv10(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, quantize_static, QuantType, QuantFormat
+            int8_path = onnx_path.replace('.onnx', '.int8.onnx')
+            if calibration_imgs:
+                quantize_static(onnx_path, int8_path, _CalibrationReader(onnx_path, calibration_imgs, imgsz),
+                                quant_format=QuantFormat.QDQ,
+                                activation_type=QuantType.QUInt8,
+                                weight_type=QuantType.QInt8)
+            else:
+                quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+            onnx_path = int8_path
+        return onnx_path
+
+    def _preprocess(self, img: ndarray) -> tuple[ndarray, float, tuple[int, int]]:
+        return _letterbox(img, self.input_size)
+
+    def predict(self, img: ndarray) -> list[StructureResult]:
+        return self.predict_batch([img])[0]
+
+    def predict_batch(self, imgs: list[ndarray]) -> list[list[StructureResult]]:
+        inputs = [self._preprocess(img) for img in imgs]
+        # YOLOv10 无需 NMS, 输出形状为 (batch, 300, 6): x1, y1, x2, y2, score, class
+        outputs = self.session.run(None, {self.input_name: np.stack([blob for blob, _, _ in inputs])})[0]
+        batch = []
+        for output, img, (_, ratio, (left, top)) in zip(outputs, imgs, inputs):
+            h, w, _ = img.shape
+            output = output[output[:, 4] >= self.conf]
+            boxes = (output[:, :4] - np.array([left, top, left, top], dtype=np.float32)) / ratio
+            boxes = np.clip(boxes, 0, np.array([w, h, w, h], dtype=np.float32))
+            batch.append((boxes, output[:, 4], [self.names[int(cls)] for cls in output[:, 5]]))
+        return _to_structure_results(batch, imgs, self.origin2type)
+
+
+def _letterbox(img: ndarray, size: int) -> tuple[ndarray, float, tuple[int, int]]:
+    """ 等比缩放并填充为正方形, 转换为 DocLayout-YOLO 的模型输入格式
+
+    Args:
+        img (ndarray): opencv (BGR) 图像对象
+        size (int): 模型输入尺寸
+
+    Returns:
+        tuple[ndarray, float, tuple[int, int]]: 模型输入, 缩放比例, 左侧和上方的填充量
+    """
+    h, w, _ = img.shape
+    ratio = min(size / h, size / w)
+    nw, nh = int(round(w * ratio)), int(round(h * ratio))
+    left, top = (size - nw) // 2, (size - nh) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    blob = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1).astype(np.float32) / 255.
+    return blob, ratio, (left, top)
+
+
+class _CalibrationReader:
+
+    def __init__(self, onnx_path: str, imgs: list[ndarray], size: int) -> None:
+        """ 静态量化的校准数据, 实现 onnxruntime.quantization.CalibrationDataReader 接口
+
+        Args:
+            onnx_path (str): 待量化的 onnx 模型路径
+            imgs (list[ndarray]): 校准页面图像 (BGR)
+            size (int): 模型输入尺寸
+        """
+        import onnxruntime as ort
+        session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+        input_name = session.get_inputs()[0].name
+        self._inputs = iter([{input_name: _letterbox(img, size)[0][None]} for img in imgs])
+
+    def get_next(self) -> dict[str, ndarray] | None:
+        return next(self._inputs, None)
+
+    def __iter__(self):
+        return iter(self.get_next, None)
+
+
+def _to_structure_results(batch: list[tuple[ndarray, ndarray, list[str]]],
+                          imgs: list[ndarray],
+                          origin2type: dict[str, str]) -> list[list[StructureResult]]:
+    """ 对一批页面的检测结果排序并去除重叠的检测框, 转换为布局分析结果
+
+    Args:
+        batch (list[tuple[ndarray, ndarray, list[str]]]): 各页面的检测结果, 包括 (N, 4) 的 (x1,y1,x2,y2) 格式 bbox 数组、(N,) 的置信度数组和类别名称
+        imgs (list[ndarray]): 页面图像
+        origin2type (dict[str, str]): 原始类别到区块类型的映射
+
+    Returns:
+        list[list[StructureResult]]: 各页面的布局分析结果
+    """
+    from paddleocr.ppstructure.recovery.recovery_to_doc import sorted_layout_boxes
 
-        # 后处理 (接受元组类型)
-        res = structure(detections=[(item['name'], item['bbox']) for item in res], iou_threshold=0.1)
+    boxes_list = [np.ascontiguousarray(boxes, dtype=np.float32).reshape(-1, 4) for boxes, _, _ in batch]
+    # 阅读顺序只需要下标, 检测框数组直接传给 suppress_batch
+    orders = [[item['index'] for item in sorted_layout_boxes([{'bbox': box, 'index': i} for i, box in enumerate(boxes)], img.shape[1])]
+              if len(boxes) else [] for boxes, img in zip(boxes_list, imgs)]
+    # 后处理: 去除被包含和重叠的检测框, 保留的下标按阅读顺序排列
+    keeps = suppress_batch(boxes_list,
+                           [np.ascontiguousarray(scores, dtype=np.float32) for _, scores, _ in batch],
+                           iou_threshold=0.1,
+                           orders=orders)
 
-        return [
+    return [
+        [
             {
-                'origin_type': item[0],
-                'bbox': item[1],
-                'type': self.origin2type.get(item[0], item[0])
-            } for item in res
-        ]
+                'origin_type': names[i],
+                'bbox': tuple(boxes[i].tolist()),
+                'type': origin2type.get(names[i], names[i])
+            } for i in keep
+        ] for boxes, (_, _, names), keep in zip(boxes_list, batch, keeps)
+    ]
@@ -7,7 +7,10 @@
 from ..resource import Resource
 from enum import Enum
 from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Any
+import shortuuid
 from ..resource import Slice
+from .utils import Transactional
 
 
 class ContentType(Enum):
@@ -125,3 +128,124 @@ class KPRelation:
 
     def __repr__(self) -> str:
         return f'''KPRelation(type="{self.type}", tail={self.tail.__repr__(False)})'''
+
+
+class KnowledgePointStore(Transactional):
+
+    def __init__(self, kps: Iterable[KPEntity] = ()) -> None:
+        """ 知识点实体存储, 保持插入顺序并提供类似列表的访问方式,
+        同时维护名称到实体的索引和每个头实体已有的 (关系类型, 尾实体名称) 集合, 查找和关系去重均为常数时间。
+        事务期间通过存储进行的修改会记录撤销日志, 可以回滚
+
+        Args:
+            kps (Iterable[KPEntity], optional): 初始的知识点实体. Defaults to ().
+        """
+        super().__init__()
+        self._kps: list[KPEntity] = []
+        self._index: dict[str, KPEntity] = {}  # 同名实体只索引最先加入的
+        self._relations: dict[str, set[tuple[str, str]]] = {}  # 头实体 id -> (关系类型, 尾实体名称)
+        for kp in kps:
+            self.append(kp)
+
+    def append(self, kp: KPEntity) -> None:
+        """ 加入知识点实体
+
+        Args:
+            kp (KPEntity): 知识点实体
+        """
+        self._kps.append(kp)
+        self._index.setdefault(kp.name, kp)
+        self._relations[kp.id] = {(relation.type, relation.tail.name) for relation in kp.relations}
+        self._record(lambda: self._pop(kp))
+
+    def _pop(self, kp: KPEntity) -> None:
+        self._kps.pop()
+        if self._index.get(kp.name) is kp:
+            del self._index[kp.name]
+        self._relations.pop(kp.id, None)
+
+    def update(self, kp: KPEntity, **fields: Any) -> None:
+        """ 修改知识点实体的字段
+
+        Args:
+            kp (KPEntity): 知识点实体
+            **fields (Any): 字段名称和新的值
+        """
+        original = {name: getattr(kp, name) for name in fields}
+        for name, value in fields.items():
+            setattr(kp, name, value)
+        self._record(lambda: [setattr(kp, name, value) for name, value in original.items()])
+
+    def add_cached_attribute(self, kp: KPEntity, name: str, value: Any) -> None:
+        """ 为知识点实体添加一个待总结的属性值
+
+        Args:
+            kp (KPEntity): 知识点实体
+            name (str): 属性名称
+            value (Any): 属性值
+        """
+        created = name not in kp.cached_attributes
+        kp.cached_attributes.setdefault(name, []).append(value)
+
+        def undo():
+            kp.cached_attributes[name].pop()
+            if created:
+                del kp.cached_attributes[name]
+        self._record(undo)
+
+    def get(self, name: str) -> KPEntity | None:
+        """ 根据名称查找知识点实体
+
+        Args:
+            name (str): 名称
+
+        Returns:
+            KPEntity | None: 知识点实体, 不存在时返回 None
+        """
+        return self._index.get(name)
+
+    def add_relation(self, head: KPEntity, relation_type: str, tail: KPEntity) -> KPRelation | None:
+        """ 为头实体添加关系, 已经存在相同类型且尾实体同名的关系时不再添加
+
+        Args:
+            head (KPEntity): 头实体
+            relation_type (str): 关系类型
+            tail (KPEntity): 尾实体
+
+        Returns:
+            KPRelation | None: 新添加的关系, 关系已经存在时返回 None
+        """
+        relations = self._relations.setdefault(head.id, set())
+        if (relation_type, tail.name) in relations:
+            return None
+        relations.add((relation_type, tail.name))
+        relation = KPRelation(id='3:' + str(shortuuid.uuid()), type=relation_type, tail=tail)
+        head.relations.append(relation)
+
+        def undo():
+            head.relations.pop()
+            relations.discard((relation_type, tail.name))
+        self._record(undo)
+        return relation
+
+    def __iter__(self) -> Iterator[KPEntity]:
+        return iter(self._kps)
+
+    def __len__(self) -> int:
+        return len(self._kps)
+
+    def __getitem__(self, index: int | slice) -> KPEntity | list[KPEntity]:
+        return self._kps[index]
+
+    def __contains__(self, kp: KPEntity) -> bool:
+        return self._index.get(kp.name) is kp or kp in self._kps
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # 撤销日志由闭包组成, 不参与序列化
+        state['_undo_log'] = []
+        state['_savepoints'] = []
+        return state
+
+    def __repr__(self) -> str:
+        return f'KnowledgePointStore({self._kps!r})'
@@ -5,24 +5,96 @@
 # Description: 工具
 
 import copy
-from functools import wraps
+from functools import wraps, partial
+from typing import Callable
 
 def instance_method_transactional(*instance_variables):
     """ 装饰实例方法, 指定实例属性名称, 在方法抛出异常的时候回滚对这些属性的更改, 然后继续抛出异常。
 
+    属性为 Transactional 对象时只回放方法执行期间记录的撤销日志, 否则在执行前深拷贝属性。
+
     Args:
         *variables (str): 需要回滚的变量名称
     """
     def decorator(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            original_state = {var: copy.deepcopy(getattr(self, var)) for var in instance_variables}
-            
+            original_state = {}
+            for var in instance_variables:
+                value = getattr(self, var)
+                if isinstance(value, Transactional):
+                    value.begin()
+                    original_state[var] = value
+                else:
+                    original_state[var] = copy.deepcopy(value)
+
             try:
-                return func(self, *args, **kwargs)
+                result = func(self, *args, **kwargs)
             except Exception as e:
                 for var, value in original_state.items():
+                    if isinstance(value, Transactional):
+                        value.rollback()
                     setattr(self, var, value)
                 raise e
+            for value in original_state.values():
+                if isinstance(value, Transactional):
+                    value.commit()
+            return result
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+class Transactional:
+    """ 基于撤销日志的事务。
+
+    事务期间的每次修改都通过 _record 记录对应的撤销操作, 回滚时按相反顺序执行, 避免在事务开始前复制整个对象。
+    事务可以嵌套, 内层事务的回滚只撤销内层事务中的修改。
+    """
+
+    def __init__(self) -> None:
+        self._undo_log: list[Callable[[], None]] = []
+        self._savepoints: list[int] = []
+
+    def begin(self) -> None:
+        """ 开始事务 (或在已有事务中设置保存点)
+        """
+        self._savepoints.append(len(self._undo_log))
+
+    def commit(self) -> None:
+        """ 提交事务, 最外层事务提交后清空撤销日志
+        """
+        self._savepoints.pop()
+        if not self._savepoints:
+            self._undo_log.clear()
+
+    def rollback(self) -> None:
+        """ 回滚事务, 按相反顺序撤销自事务开始以来的修改
+        """
+        savepoint = self._savepoints.pop()
+        while len(self._undo_log) > savepoint:
+            self._undo_log.pop()()
+
+    def _record(self, undo: Callable[[], None]) -> None:
+        """ 记录一次修改的撤销操作, 不在事务中时不记录
+
+        Args:
+            undo (Callable[[], None]): 撤销操作
+        """
+        if self._savepoints:
+            self._undo_log.append(undo)
+
+
+class ReconstructMixin:
+    """ 序列化时只保存构造参数, 反序列化时重新调用构造函数。
+
+    用于持有不可序列化资源 (模型权重、推理引擎等) 的对象, 使其可以被传递到子进程中, 并在子进程中重新加载。
+    """
+
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls)
+        obj._init_args = (args, kwargs)
+        return obj
+
+    def __reduce__(self):
+        args, kwargs = self._init_args
+        return partial(type(self), **kwargs), args
@@ -1,5 +1,8 @@
+use numpy::{PyReadonlyArray1, PyReadonlyArray2, PyUntypedArrayMethods};
+use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
-use rand::Rng;
+use regex::Regex;
+use std::sync::OnceLock;
 
 #[pyfunction]
 pub fn get_list(text: &str) -> PyResult<Vec<String>> {
@@ -181,57 +184,396 @@ fn contained(box1: (f32, f32, f32, f32), box2: (f32, f32, f32, f32)) -> bool {
     box1.0 <= box2.0 && box1.1 <= box2.1 && box1.2 >= box2.2 && box1.3 >= box2.3
 }
 
+fn get_box(boxes: &[f32], i: usize) -> (f32, f32, f32, f32) {
+    (boxes[i * 4], boxes[i * 4 + 1], boxes[i * 4 + 2], boxes[i * 4 + 3])
+}
+
+/// 去除重叠的检测框, boxes 为按行展开的 (N, 4) 数组, 返回保留的下标 (升序)
+///
+/// 1. 被其它检测框包含的检测框被移除 (完全相同时保留置信度高者, 置信度相同时保留下标小者)
+/// 2. 其余检测框按置信度从高到低依次保留, 与已保留的检测框 iou 超过阈值的被移除
+///
+/// 先按 y1 排序, 扫描线只比较 y 方向区间相交的检测框 (版面中的区块主要在竖直方向上分隔, 单栏页面的区块在 x 方向几乎全部相交),
+/// 结果与输入顺序以外的因素无关
+fn suppress_boxes(boxes: &[f32], scores: &[f32], iou_threshold: f32) -> Vec<usize> {
+    let n = scores.len();
+    // 优先级: 置信度高者优先, 相同时下标小者优先
+    let higher = |a: usize, b: usize| scores[a] > scores[b] || (scores[a] == scores[b] && a < b);
+
+    // 扫描线寻找 y 方向区间相交的候选对
+    let mut by_y1: Vec<usize> = (0..n).collect();
+    by_y1.sort_by(|&a, &b| boxes[a * 4 + 1].total_cmp(&boxes[b * 4 + 1]).then(a.cmp(&b)));
+    let mut active: Vec<usize> = Vec::new();
+    let mut removed = vec![false; n];
+    let mut overlaps: Vec<Vec<usize>> = vec![Vec::new(); n];
+    for &i in &by_y1 {
+        let bi = get_box(boxes, i);
+        active.retain(|&j| boxes[j * 4 + 3] >= bi.1);
+        for &j in &active {
+            let bj = get_box(boxes, j);
+            if bj.0 > bi.2 || bi.0 > bj.2 {
+                continue; // x 方向不相交
+            }
+            let (i_in_j, j_in_i) = (contained(bj, bi), contained(bi, bj));
+            if i_in_j && j_in_i {
+                removed[if higher(i, j) { j } else { i }] = true;
+            } else if i_in_j {
+                removed[i] = true;
+            } else if j_in_i {
+                removed[j] = true;
+            } else if iou(bi, bj) > iou_threshold {
+                overlaps[i].push(j);
+                overlaps[j].push(i);
+            }
+        }
+        active.push(i);
+    }
+
+    // 按优先级贪心保留
+    let mut order: Vec<usize> = (0..n).filter(|&i| !removed[i]).collect();
+    order.sort_by(|&a, &b| scores[b].total_cmp(&scores[a]).then(a.cmp(&b)));
+    let mut kept = vec![false; n];
+    for i in order {
+        if !overlaps[i].iter().any(|&j| kept[j]) {
+            kept[i] = true;
+        }
+    }
+    (0..n).filter(|&i| kept[i]).collect()
+}
+
+fn as_boxes<'a>(
+    boxes: &'a PyReadonlyArray2<'_, f32>,
+    scores: &'a PyReadonlyArray1<'_, f32>,
+) -> PyResult<(&'a [f32], &'a [f32])> {
+    let shape = boxes.shape();
+    if shape[1] != 4 || shape[0] != scores.len() {
+        return Err(PyValueError::new_err(format!(
+            "boxes must have shape (N, 4) and scores shape (N,), got {:?} and ({},)",
+            shape,
+            scores.len()
+        )));
+    }
+    Ok((boxes.as_slice()?, scores.as_slice()?))
+}
+
+#[pyfunction]
+#[pyo3(signature = (boxes, scores, iou_threshold=0.1))]
+pub fn suppress(
+    py: Python<'_>,
+    boxes: PyReadonlyArray2<'_, f32>,
+    scores: PyReadonlyArray1<'_, f32>,
+    iou_threshold: f32,
+) -> PyResult<Vec<usize>> {
+    let (boxes, scores) = as_boxes(&boxes, &scores)?;
+    Ok(py.allow_threads(|| suppress_boxes(boxes, scores, iou_threshold)))
+}
+
+/// 按 order 中的顺序 (例如阅读顺序) 排列保留的下标, 不在 order 中的检测框不保留; order 中有越界或重复的下标时返回 None
+fn apply_order(keep: &[usize], n: usize, order: &[usize]) -> Option<Vec<usize>> {
+    let mut seen = vec![false; n];
+    if !order.iter().all(|&i| i < n && !std::mem::replace(&mut seen[i], true)) {
+        return None;
+    }
+    let mut kept = vec![false; n];
+    for &i in keep {
+        kept[i] = true;
+    }
+    Some(order.iter().copied().filter(|&i| kept[i]).collect())
+}
+
+#[pyfunction]
+#[pyo3(signature = (boxes, scores, iou_threshold=0.1, orders=None))]
+pub fn suppress_batch(
+    py: Python<'_>,
+    boxes: Vec<PyReadonlyArray2<'_, f32>>,
+    scores: Vec<PyReadonlyArray1<'_, f32>>,
+    iou_threshold: f32,
+    orders: Option<Vec<Vec<usize>>>,
+) -> PyResult<Vec<Vec<usize>>> {
+    if boxes.len() != scores.len() || orders.as_ref().is_some_and(|o| o.len() != boxes.len()) {
+        return Err(PyValueError::new_err("boxes, scores and orders must have the same length"));
+    }
+    let pages = boxes
+        .iter()
+        .zip(scores.iter())
+        .map(|(b, s)| as_boxes(b, s))
+        .collect::<PyResult<Vec<_>>>()?;
+    let keeps: Vec<Vec<usize>> = py.allow_threads(|| {
+        pages
+            .iter()
+            .map(|(b, s)| suppress_boxes(b, s, iou_threshold))
+            .collect()
+    });
+    let Some(orders) = orders else {
+        return Ok(keeps);
+    };
+    keeps
+        .iter()
+        .zip(pages.iter())
+        .zip(orders.iter())
+        .map(|((keep, (_, s)), order)| {
+            apply_order(keep, s.len(), order).ok_or_else(|| {
+                PyValueError::new_err(format!("orders must hold distinct indices in 0..{}", s.len()))
+            })
+        })
+        .collect()
+}
+
 #[pyfunction]
 pub fn structure(
     detections: Vec<(String, (f32, f32, f32, f32))>,
     iou_threshold: f32,
 ) -> PyResult<Vec<(String, (f32, f32, f32, f32))>> {
-    // 先转换为 mut
-    let mut detections = detections;
-    let mut filtered_detections = Vec::new();
-
-    while !detections.is_empty() {
-        let detection = detections.remove(0);
-        let mut keep = true;
-
-        // 用于存储待移除的检测框
-        let mut to_remove = Vec::new();
-
-        for other_detection in detections.clone() {
-            if iou(detection.1, other_detection.1) > iou_threshold {
-                // 随机选择是否移除
-                if rand::thread_rng().gen_bool(0.5) {
-                    to_remove.push(other_detection);
-                } else {
-                    keep = false;
-                    break;
+    // 没有置信度时靠前的检测框优先
+    let boxes: Vec<f32> = detections
+        .iter()
+        .flat_map(|(_, b)| [b.0, b.1, b.2, b.3])
+        .collect();
+    let scores = vec![0.0; detections.len()];
+    let keep = suppress_boxes(&boxes, &scores, iou_threshold);
+    Ok(keep.into_iter().map(|i| detections[i].clone()).collect())
+}
+
+fn numbering_patterns() -> &'static Vec<(Regex, i32)> {
+    static PATTERNS: OnceLock<Vec<(Regex, i32)>> = OnceLock::new();
+    PATTERNS.get_or_init(|| {
+        vec![
+            (Regex::new(r"^第[一二三四五六七八九十百零\d]+\s*[章篇部]").unwrap(), 1),
+            (Regex::new(r"^第[一二三四五六七八九十百零\d]+\s*节").unwrap(), 2),
+            (Regex::new(r"^\d+\.\d+\.\d+(?:[^\d.]|$)").unwrap(), 3),
+            (Regex::new(r"^\d+\.\d+(?:[^\d.]|$)").unwrap(), 2),
+        ]
+    })
+}
+
+#[pyfunction]
+pub fn heading_level(title: &str) -> i32 {
+    let title = title.trim();
+    numbering_patterns()
+        .iter()
+        .find(|(pattern, _)| pattern.is_match(title))
+        .map_or(0, |(_, level)| *level)
+}
+
+fn is_leader(c: char) -> bool {
+    matches!(c, '.' | '·' | '…' | '‥' | '⋯' | '•' | '．' | '_' | '-' | '—' | '─')
+}
+
+#[pyfunction]
+pub fn parse_toc(text: &str) -> Vec<(String, i32, i32, f32)> {
+    static ENTRY: OnceLock<Regex> = OnceLock::new();
+    let entry = ENTRY.get_or_init(|| {
+        Regex::new(r"^(?P<title>.*?[^\s.·…‥⋯•．_\-—─])(?P<leader>[\s.·…‥⋯•．_\-—─]*)(?P<page>\d{1,4})$")
+            .unwrap()
+    });
+
+    let mut result: Vec<(String, i32, i32, f32)> = Vec::new();
+    let mut pending: Option<String> = None; // 还没有页码的标题 (标题折行或页码单独成行)
+    let mut last_page = -1;
+
+    for line in text.lines() {
+        let line = line.trim();
+        if line.is_empty() || line.chars().all(is_leader) {
+            continue;
+        }
+
+        // 页码单独成行
+        if line.chars().all(|c| c.is_ascii_digit()) {
+            if let (Some(title), Ok(page)) = (pending.take(), line.parse::<i32>()) {
+                let level = heading_level(&title);
+                let mut confidence = if level > 0 { 0.7 } else { 0.3 };
+                if page < last_page {
+                    confidence *= 0.5;
                 }
-            } else if contained(detection.1, other_detection.1) {
-                to_remove.push(other_detection);
-            } else if contained(other_detection.1, detection.1) {
-                keep = false;
-                break;
+                last_page = page;
+                result.push((title, page, level, confidence));
             }
+            continue;
         }
 
-        for item in to_remove {
-            detections.retain(|x| x != &item);
+        let Some(caps) = entry.captures(line) else {
+            // 没有页码, 可能是折行的标题
+            if let Some(title) = pending.take() {
+                let level = heading_level(line);
+                if level > 0 {
+                    result.push((title.clone(), -1, heading_level(&title), 0.0));
+                    pending = Some(line.to_string());
+                } else {
+                    pending = Some(title + line);
+                }
+            } else {
+                pending = Some(line.to_string());
+            }
+            continue;
+        };
+
+        let mut title = caps["title"].trim().to_string();
+        let leader = &caps["leader"];
+        let page: i32 = caps["page"].parse().unwrap_or(-1);
+        let mut confidence: f32 = if leader.chars().filter(|&c| is_leader(c)).count() >= 2 {
+            0.6 // 点状引导线
+        } else if !leader.is_empty() {
+            0.4 // 空白分隔
+        } else {
+            0.2 // 标题和页码直接相连
+        };
+        if let Some(previous) = pending.take() {
+            if heading_level(&title) > 0 {
+                result.push((previous.clone(), -1, heading_level(&previous), 0.0));
+            } else {
+                title = previous + &title; // 折行的标题
+                confidence -= 0.1;
+            }
         }
-
-        if keep {
-            filtered_detections.push(detection);
+        let level = heading_level(&title);
+        if level > 0 {
+            confidence += 0.4;
+        }
+        if page < last_page {
+            confidence *= 0.5; // 页码倒退
         }
+        last_page = page;
+        result.push((title, page, level, confidence.clamp(0.0, 1.0)));
     }
-
-    Ok(filtered_detections)
+    if let Some(title) = pending {
+        let level = heading_level(&title);
+        result.push((title, -1, level, 0.0));
+    }
+    result
 }
 
 #[pymodule]
 fn _core(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(get_list, m)?)?;
     m.add_function(wrap_pyfunction!(structure, m)?)?;
+    m.add_function(wrap_pyfunction!(suppress, m)?)?;
+    m.add_function(wrap_pyfunction!(suppress_batch, m)?)?;
     m.add_function(wrap_pyfunction!(get_longest_seq, m)?)?;
     m.add_function(wrap_pyfunction!(optimize_length, m)?)?;
     m.add_function(wrap_pyfunction!(merge, m)?)?;
+    m.add_function(wrap_pyfunction!(heading_level, m)?)?;
+    m.add_function(wrap_pyfunction!(parse_toc, m)?)?;
     Ok(())
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn flatten(boxes: &[(f32, f32, f32, f32)]) -> Vec<f32> {
+        boxes.iter().flat_map(|b| [b.0, b.1, b.2, b.3]).collect()
+    }
+
+    #[test]
+    fn suppress_removes_contained_boxes() {
+        // 被包含的检测框即使置信度更高也被移除
+        let boxes = flatten(&[(0.0, 0.0, 100.0, 100.0), (10.0, 10.0, 50.0, 50.0), (200.0, 0.0, 300.0, 80.0)]);
+        assert_eq!(suppress_boxes(&boxes, &[0.5, 0.9, 0.3], 0.1), vec![0, 2]);
+    }
+
+    #[test]
+    fn suppress_breaks_ties_by_score_then_index() {
+        // 完全相同的检测框保留置信度高者
+        let same = flatten(&[(0.0, 0.0, 10.0, 10.0), (0.0, 0.0, 10.0, 10.0)]);
+        assert_eq!(suppress_boxes(&same, &[0.5, 0.9], 0.1), vec![1]);
+        // 置信度也相同时保留下标小者
+        assert_eq!(suppress_boxes(&same, &[0.7, 0.7], 0.1), vec![0]);
+        // 部分重叠的检测框同理
+        let overlapping = flatten(&[(0.0, 0.0, 10.0, 10.0), (5.0, 0.0, 15.0, 10.0)]);
+        assert_eq!(suppress_boxes(&overlapping, &[0.4, 0.8], 0.1), vec![1]);
+        assert_eq!(suppress_boxes(&overlapping, &[0.6, 0.6], 0.1), vec![0]);
+        // iou 不超过阈值时都保留
+        assert_eq!(suppress_boxes(&overlapping, &[0.6, 0.6], 0.5), vec![0, 1]);
+    }
+
+    #[test]
+    fn suppress_is_independent_of_input_order() {
+        let boxes = [
+            (0.0, 0.0, 100.0, 40.0),
+            (5.0, 2.0, 95.0, 38.0),
+            (80.0, 0.0, 180.0, 40.0),
+            (0.0, 50.0, 100.0, 90.0),
+            (10.0, 55.0, 110.0, 95.0),
+            (300.0, 300.0, 400.0, 400.0),
+            (300.0, 300.0, 400.0, 400.0),
+        ];
+        let scores = [0.9, 0.95, 0.8, 0.7, 0.75, 0.6, 0.65];
+        let expected: Vec<usize> = suppress_boxes(&flatten(&boxes), &scores, 0.1);
+        assert_eq!(expected, vec![0, 4, 6]);
+
+        let orders: [[usize; 7]; 3] = [[6, 5, 4, 3, 2, 1, 0], [3, 0, 6, 1, 5, 2, 4], [2, 4, 6, 0, 1, 3, 5]];
+        for order in orders {
+            let shuffled: Vec<(f32, f32, f32, f32)> = order.iter().map(|&i| boxes[i]).collect();
+            let shuffled_scores: Vec<f32> = order.iter().map(|&i| scores[i]).collect();
+            let mut kept: Vec<usize> = suppress_boxes(&flatten(&shuffled), &shuffled_scores, 0.1)
+                .into_iter()
+                .map(|i| order[i])
+                .collect();
+            kept.sort();
+            assert_eq!(kept, expected);
+        }
+    }
+
+    #[test]
+    fn suppress_handles_single_column_pages() {
+        // 单栏页面的区块在 x 方向全部相交, 只有 y 方向相交的区块需要比较
+        let mut boxes: Vec<(f32, f32, f32, f32)> = (0..50)
+            .map(|i| (50.0, i as f32 * 20.0, 550.0, i as f32 * 20.0 + 15.0))
+            .collect();
+        boxes.push((52.0, 1.0, 548.0, 14.0)); // 被第一个区块包含
+        let scores = vec![0.5; boxes.len()];
+        assert_eq!(suppress_boxes(&flatten(&boxes), &scores, 0.1), (0..50).collect::<Vec<_>>());
+    }
+
+    #[test]
+    fn apply_order_follows_reading_order() {
+        assert_eq!(apply_order(&[0, 2, 3], 4, &[3, 1, 0, 2]), Some(vec![3, 0, 2]));
+        assert_eq!(apply_order(&[0, 1], 2, &[1]), Some(vec![1]));
+        assert_eq!(apply_order(&[0], 2, &[0, 0]), None);
+        assert_eq!(apply_order(&[0], 2, &[2]), None);
+    }
+
+    #[test]
+    fn heading_level_recognizes_numbering() {
+        assert_eq!(heading_level("第3章 神经网络"), 1);
+        assert_eq!(heading_level("第十二章 总结"), 1);
+        assert_eq!(heading_level("第二节 梯度下降"), 2);
+        assert_eq!(heading_level("6.1 参数的更新"), 2);
+        assert_eq!(heading_level("6.1.2 SGD"), 3);
+        assert_eq!(heading_level("前言"), 0);
+    }
+
+    #[test]
+    fn parse_toc_reads_dot_leader_lines() {
+        let entries = parse_toc("6.1 参数的更新······163");
+        assert_eq!(entries.len(), 1);
+        let (title, page, level, confidence) = &entries[0];
+        assert_eq!((title.as_str(), *page, *level), ("6.1 参数的更新", 163, 2));
+        assert!(*confidence >= 0.6);
+    }
+
+    #[test]
+    fn parse_toc_reads_page_number_on_its_own_line() {
+        let entries = parse_toc("第1章 绪论\n1\n1.1 背景\n3");
+        let parsed: Vec<(&str, i32, i32)> = entries.iter().map(|(t, p, l, _)| (t.as_str(), *p, *l)).collect();
+        assert_eq!(parsed, vec![("第1章 绪论", 1, 1), ("1.1 背景", 3, 2)]);
+        assert!(entries.iter().all(|entry| entry.3 >= 0.6));
+    }
+
+    #[test]
+    fn parse_toc_joins_wrapped_titles() {
+        let entries = parse_toc("1.2 一个很长的标题\n被折行了······12\n1.3 下一节······15");
+        let parsed: Vec<(&str, i32, i32)> = entries.iter().map(|(t, p, l, _)| (t.as_str(), *p, *l)).collect();
+        assert_eq!(parsed, vec![("1.2 一个很长的标题被折行了", 12, 2), ("1.3 下一节", 15, 2)]);
+    }
+
+    #[test]
+    fn parse_toc_reads_chapter_headings() {
+        let entries = parse_toc("第2章 感知机··········25\n2.1 感知机是什么······25\n第3章 神经网络··········40");
+        let parsed: Vec<(&str, i32, i32)> = entries.iter().map(|(t, p, l, _)| (t.as_str(), *p, *l)).collect();
+        assert_eq!(parsed, vec![("第2章 感知机", 25, 1), ("2.1 感知机是什么", 25, 2), ("第3章 神经网络", 40, 1)]);
+        // 页码倒退的行置信度降低
+        let entries = parse_toc("第3章 神经网络······40\n第4章 学习······12");
+        assert!(entries[1].3 < entries[0].3);
+    }
+}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Create Date: 2026/10/17
+# Author: wangtao <wangtao.cpu@gmail.com>
+# File Name: tests/test_layout_yolo_onnx.py
+# Description: LayoutYOLOOnnx (FP32 与 INT8) 与 LayoutYOLO (torch) 后端的结果一致性测试
+
+import os
+import shutil
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+fitz = pytest.importorskip('fitz')
+pytest.importorskip('doclayout_yolo')
+pytest.importorskip('onnxruntime')
+pytest.importorskip('paddleocr')  # 阅读顺序排序依赖
+
+from course_graph.parser.pdf_parser import LayoutYOLO, LayoutYOLOOnnx
+
+WEIGHTS = os.environ.get('DOCLAYOUT_YOLO_WEIGHTS', '')  # DocLayout-YOLO 权重路径
+
+
+@pytest.fixture(scope='module')
+def page_img() -> np.ndarray:
+    # 生成包含标题、正文和图片区域的单页 pdf 并渲染为图像
+    pdf = fitz.open()
+    page = pdf.new_page(width=595, height=842)
+    page.insert_text((72, 100), 'Chapter 1 Introduction', fontsize=24)
+    paragraph = 'Knowledge graphs organize the concepts of a course and the relations between them. ' * 6
+    page.insert_textbox(fitz.Rect(72, 140, 523, 320), paragraph, fontsize=11)
+    page.draw_rect(fitz.Rect(150, 360, 445, 600), color=(0, 0, 0), fill=(0.6, 0.7, 0.9))
+    page.insert_text((220, 625), 'Figure 1.1 An example figure', fontsize=10)
+    page.insert_textbox(fitz.Rect(72, 660, 523, 780), paragraph, fontsize=11)
+    zoom = 1024 / 842
+    pm = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, pm.n)
+    pdf.close()
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+def iou(box1: tuple, box2: tuple) -> float:
+    x1, y1 = max(box1[0], box2[0]), max(box1[1], box2[1])
+    x2, y2 = min(box1[2], box2[2]), min(box1[3], box2[3])
+    inter = max(x2 - x1, 0) * max(y2 - y1, 0)
+    union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + (box2[2] - box2[0]) * (box2[3] - box2[1]) - inter
+    return inter / union if union else 0.
+
+
+@pytest.fixture(scope='module')
+def weights(tmp_path_factory: pytest.TempPathFactory) -> str:
+    # 导出的 onnx 模型写在权重文件所在目录, 复制到临时目录以免污染用户的目录
+    if not os.path.isfile(WEIGHTS):
+        pytest.skip('未提供 DocLayout-YOLO 权重 (DOCLAYOUT_YOLO_WEIGHTS)')
+    path = tmp_path_factory.mktemp('weights') / os.path.basename(WEIGHTS)
+    shutil.copyfile(WEIGHTS, path)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def expected(weights: str, page_img: np.ndarray) -> list[dict]:
+    blocks = LayoutYOLO(weights, device='cpu').predict(page_img)
+    assert blocks, '测试页面没有检测到任何区块'
+    return blocks
+
+
+def test_onnx_matches_torch(weights: str, page_img: np.ndarray, expected: list[dict]) -> None:
+    actual = LayoutYOLOOnnx(LayoutYOLOOnnx.export(weights)).predict(page_img)
+
+    assert [block['type'] for block in actual] == [block['type'] for block in expected]
+    assert [block['origin_type'] for block in actual] == [block['origin_type'] for block in expected]
+    for block, block_ in zip(actual, expected):
+        assert np.allclose(block['bbox'], block_['bbox'], atol=4.0)  # 预处理插值差异带来的像素级偏差
+
+
+@pytest.mark.parametrize('calibrate', [True, False], ids=['static', 'dynamic'])
+def test_int8_onnx_matches_fp32(weights: str, page_img: np.ndarray, expected: list[dict], calibrate: bool) -> None:
+    # 量化模型能够在 CPU 上创建会话, 且检测到的区块与 FP32 模型基本一致
+    onnx_path = LayoutYOLOOnnx.export(weights, quantize=True, calibration_imgs=[page_img] if calibrate else None)
+    actual = LayoutYOLOOnnx(onnx_path).predict(page_img)
+
+    for block_ in expected:
+        assert any(block['type'] == block_['type'] and iou(block['bbox'], block_['bbox']) >= 0.7 for block in actual), \
+            f'量化模型没有检测到 {block_["type"]} 区块 {block_["bbox"]}'